@@ -2,36 +2,74 @@
 Endpoints para processamento de documentos fiscais.
 """
 
-from typing import List
+import asyncio
+import math
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Union
 from uuid import UUID
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from anyio import to_thread
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, UploadFile, File, Form
 
+from app.core import settings
 from app.core.logging import get_logger, log_processing_event
 from app.models.fiscal import (
     NFEDocument,
     BatchProcessingRequest,
     BatchProcessingResponse,
     DocumentProcessingResult,
+    DocumentType,
     ProcessingJob,
     JobStatus
 )
-from app.services.xml_processor import XMLProcessor, XMLProcessingError
+from app.services.xml_processor import (
+    XMLProcessingError,
+    XMLProcessor,
+    get_processor,
+    process_nfe_documents_worker
+)
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 logger = get_logger("documents_api")
 
+_UTF8_BOM = b'\xef\xbb\xbf'
+
+# Limites de /batch-upload (os arquivos do lote ficam em memória ao mesmo tempo)
+_MAX_BATCH_UPLOAD_FILES = 100
+_MAX_BATCH_UPLOAD_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+_MAX_BATCH_UPLOAD_TOTAL_SIZE = 50 * 1024 * 1024  # 50MB
+
+
+def _looks_like_xml(content: bytes) -> bool:
+    """
+    Verifica se o conteúdo começa como um documento XML.
+    
+    Descarta BOM UTF-8 e espaços iniciais e exige '<' como primeiro
+    caractere, rejeitando uploads que não são XML antes do parser.
+    
+    Args:
+        content: Conteúdo bruto do arquivo
+        
+    Returns:
+        bool: True se o conteúdo aparenta ser XML
+    """
+    if content.startswith(_UTF8_BOM):
+        content = content[len(_UTF8_BOM):]
+    return content[:64].lstrip()[:1] == b'<'
+
 
 @router.post("/process", response_model=NFEDocument)
 async def process_single_document(
-    xml_file: UploadFile = File(..., description="Arquivo XML da NF-e")
-) -> NFEDocument:
+    xml_file: UploadFile = File(..., description="Arquivo XML da NF-e"),
+    processor: XMLProcessor = Depends(get_processor)
+) -> Response:
     """
     Processa um único documento NF-e.
     
     Args:
         xml_file: Arquivo XML da NF-e para processamento
+        processor: Processador XML compartilhado (injetado)
         
     Returns:
         Documento processado com tributos atualizados
@@ -40,20 +78,26 @@ async def process_single_document(
         HTTPException: Se houver erro no processamento
     """
     try:
-        # Validar tipo de arquivo
-        if not xml_file.filename.lower().endswith('.xml'):
+        # Validar tipo de arquivo (apenas a extensão é normalizada)
+        filename = xml_file.filename
+        if not filename or filename[-4:].lower() != '.xml':
             raise HTTPException(
                 status_code=400,
                 detail="Arquivo deve ser um XML válido"
             )
         
-        # Ler conteúdo do arquivo
+        # Ler conteúdo do arquivo (bytes são entregues direto ao lxml)
         xml_content = await xml_file.read()
-        xml_string = xml_content.decode('utf-8')
         
-        # Processar documento
-        processor = XMLProcessor()
-        document = processor.process_nfe_document(xml_string)
+        # Rejeitar conteúdo que não é XML antes de acionar o parser
+        if not _looks_like_xml(xml_content):
+            raise HTTPException(
+                status_code=400,
+                detail="Arquivo deve ser um XML válido"
+            )
+        
+        # Processar documento em thread para não bloquear o event loop
+        document = await to_thread.run_sync(processor.process_nfe_document, xml_content)
         
         log_processing_event(
             "single_document_processed",
@@ -62,8 +106,11 @@ async def process_single_document(
             file_size=len(xml_content)
         )
         
-        return document
+        # Serialização direta pelo pydantic-core (sem jsonable_encoder)
+        return Response(content=document.model_dump_json(), media_type="application/json")
         
+    except HTTPException:
+        raise
     except XMLProcessingError as e:
         logger.error(
             "xml_processing_error",
@@ -86,18 +133,147 @@ async def process_single_document(
         )
 
 
+async def _process_batch(
+    documents: List[Union[bytes, str]],
+    batch_size: int,
+    timeout_minutes: int,
+    http_request: Request
+) -> BatchProcessingResponse:
+    """
+    Processa documentos NF-e em paralelo no pool de processos.
+    
+    Os documentos são distribuídos em blocos, com concorrência limitada
+    pelo tamanho do lote. Excedido timeout_minutes, os blocos ainda não
+    concluídos são descartados e o job termina como FAILED.
+    
+    Args:
+        documents: XMLs para processamento (bytes são entregues sem cópia)
+        batch_size: Documentos em processamento simultâneo
+        timeout_minutes: Timeout do job em minutos
+        http_request: Requisição HTTP (acesso ao pool de processos)
+        
+    Returns:
+        Informações do job de processamento
+    """
+    # Criar job de processamento
+    job = ProcessingJob(
+        total_documents=len(documents),
+        batch_size=batch_size,
+        timeout_minutes=timeout_minutes
+    )
+    
+    # Estimar duração considerando o paralelismo disponível
+    workers = settings.xml_process_workers
+    estimated_duration = math.ceil(
+        len(documents) * settings.estimated_ms_per_document / (workers * 60_000)
+    )
+    
+    # Pool de processos criado no startup; sem ele, usa o executor padrão
+    pool = getattr(http_request.app.state, "xml_pool", None)
+    loop = asyncio.get_running_loop()
+    
+    # Documentos agrupados em blocos por chamada ao pool; a concorrência
+    # continua limitada a batch_size documentos em processamento
+    chunk_size = max(1, min(settings.xml_worker_chunk_size, batch_size))
+    chunks = [
+        documents[start:start + chunk_size]
+        for start in range(0, len(documents), chunk_size)
+    ]
+    semaphore = asyncio.Semaphore(max(1, batch_size // chunk_size))
+    
+    # Resultado de cada bloco (None enquanto não concluído)
+    chunk_results: List[Union[List[bool], Exception, None]] = [None] * len(chunks)
+    
+    async def worker(index: int, chunk: List[Union[bytes, str]]) -> None:
+        async with semaphore:
+            try:
+                chunk_results[index] = await loop.run_in_executor(
+                    pool, process_nfe_documents_worker, chunk
+                )
+            except Exception as e:
+                # Falha do worker (ex.: processo encerrado) perde o bloco inteiro
+                chunk_results[index] = e
+    
+    job.status = JobStatus.RUNNING
+    job.started_at = datetime.utcnow()
+    
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(*(worker(i, chunk) for i, chunk in enumerate(chunks))),
+            timeout=timeout_minutes * 60
+        )
+    except asyncio.TimeoutError:
+        # Blocos à espera do semáforo são cancelados; os que já estão no
+        # pool terminam, mas seus resultados não entram no job
+        job.status = JobStatus.FAILED
+        job.error_message = f"tempo limite de {timeout_minutes} min excedido"
+    
+    processed = failed = 0
+    for chunk, result in zip(chunks, chunk_results):
+        if result is None:
+            continue
+        processed += len(chunk)
+        if isinstance(result, Exception):
+            failed += len(chunk)
+        else:
+            failed += result.count(False)
+    job.processed_documents = processed
+    job.failed_documents = failed
+    job.successful_documents = processed - failed
+    job.completed_at = datetime.utcnow()
+    
+    if job.status == JobStatus.FAILED:
+        message = (
+            f"Job interrompido: {job.error_message}. {job.processed_documents} de "
+            f"{job.total_documents} documentos processados, "
+            f"{job.successful_documents} com sucesso."
+        )
+    else:
+        job.status = JobStatus.COMPLETED
+        message = (
+            f"Job concluído. {job.successful_documents} de {job.total_documents} "
+            f"documentos processados com sucesso."
+        )
+    
+    response = BatchProcessingResponse(
+        job_id=job.id,
+        status=job.status,
+        total_documents=job.total_documents,
+        estimated_duration_minutes=max(1, estimated_duration),
+        status_url=f"/api/v1/jobs/{job.id}/status",
+        message=message
+    )
+    
+    log_processing_event(
+        "batch_job_completed" if job.status == JobStatus.COMPLETED else "batch_job_timed_out",
+        str(job.id),
+        total_documents=job.total_documents,
+        processed_documents=job.processed_documents,
+        successful_documents=job.successful_documents,
+        failed_documents=job.failed_documents,
+        batch_size=batch_size
+    )
+    
+    return response
+
+
 @router.post("/batch", response_model=BatchProcessingResponse)
 async def process_batch_documents(
-    request: BatchProcessingRequest
+    request: BatchProcessingRequest,
+    http_request: Request
 ) -> BatchProcessingResponse:
     """
-    Inicia processamento em lote de documentos NF-e.
+    Processa em lote documentos NF-e em paralelo.
+    
+    Os documentos são distribuídos no pool de processos da aplicação,
+    com concorrência limitada pelo tamanho do lote.
     
     Args:
         request: Requisição com lista de XMLs para processamento
+        http_request: Requisição HTTP (acesso ao pool de processos)
         
     Returns:
-        Informações do job criado para processamento
+        Informações do job de processamento
     """
     try:
         # Validar documentos
@@ -107,41 +283,112 @@ async def process_batch_documents(
                 detail="Lista de documentos não pode estar vazia"
             )
         
-        # Criar job de processamento
-        job = ProcessingJob(
-            total_documents=len(request.documents),
-            batch_size=request.batch_size,
-            timeout_minutes=request.timeout_minutes
+        return await _process_batch(
+            request.documents,
+            request.batch_size,
+            request.timeout_minutes,
+            http_request
         )
         
-        # TODO: Implementar processamento assíncrono real
-        # Por enquanto, apenas simular
+    except Exception as e:
+        logger.error(
+            "batch_creation_error",
+            error=str(e),
+            documents_count=len(request.documents) if request.documents else 0
+        )
+        raise HTTPException(
+            status_code=500,
+            detail="Erro ao criar job de processamento"
+        )
+
+
+@router.post("/batch-upload", response_model=BatchProcessingResponse)
+async def process_batch_uploads(
+    http_request: Request,
+    xml_files: List[UploadFile] = File(..., description="Arquivos XML das NF-e"),
+    batch_size: int = Form(default=100, ge=1, le=1000, description="Tamanho do lote"),
+    timeout_minutes: int = Form(default=30, ge=1, le=120, description="Timeout em minutos")
+) -> BatchProcessingResponse:
+    """
+    Processa em lote documentos NF-e enviados como arquivos (multipart).
+    
+    Alternativa a /batch sem embutir os XMLs em JSON: os bytes chegam
+    sem escape e seguem direto para o pool de processos. Quantidade e
+    tamanho dos arquivos são limitados, e cada arquivo passa pela mesma
+    verificação de conteúdo de /process antes do processamento.
+    
+    Args:
+        http_request: Requisição HTTP (acesso ao pool de processos)
+        xml_files: Arquivos XML para processamento
+        batch_size: Tamanho do lote
+        timeout_minutes: Timeout em minutos
         
-        # Estimar duração (2 segundos por documento)
-        estimated_duration = len(request.documents) * 2 // 60  # em minutos
+    Returns:
+        Informações do job de processamento
         
-        response = BatchProcessingResponse(
-            job_id=job.id,
-            total_documents=job.total_documents,
-            estimated_duration_minutes=max(1, estimated_duration),
-            status_url=f"/api/v1/jobs/{job.id}/status",
-            message=f"Job criado com sucesso. {job.total_documents} documentos serão processados."
+    Raises:
+        HTTPException: Se algum arquivo for inválido ou os limites do lote
+            forem excedidos
+    """
+    if len(xml_files) > _MAX_BATCH_UPLOAD_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo de {_MAX_BATCH_UPLOAD_FILES} arquivos por lote"
         )
-        
-        log_processing_event(
-            "batch_job_created",
-            str(job.id),
-            total_documents=job.total_documents,
-            batch_size=request.batch_size
+    
+    # Tamanhos declarados no upload verificados antes de ler qualquer arquivo
+    declared_total = 0
+    for xml_file in xml_files:
+        filename = xml_file.filename
+        if not filename or filename[-4:].lower() != '.xml':
+            raise HTTPException(
+                status_code=400,
+                detail=f"Arquivo deve ser um XML válido: {filename}"
+            )
+        if xml_file.size is not None:
+            if xml_file.size > _MAX_BATCH_UPLOAD_FILE_SIZE:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Arquivo muito grande (máx 5MB): {filename}"
+                )
+            declared_total += xml_file.size
+    if declared_total > _MAX_BATCH_UPLOAD_TOTAL_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail="Lote muito grande. Máximo permitido: 50MB"
         )
-        
-        return response
+    
+    documents = []
+    total_size = 0
+    for xml_file in xml_files:
+        content = await xml_file.read()
+        if len(content) > _MAX_BATCH_UPLOAD_FILE_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Arquivo muito grande (máx 5MB): {xml_file.filename}"
+            )
+        total_size += len(content)
+        if total_size > _MAX_BATCH_UPLOAD_TOTAL_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail="Lote muito grande. Máximo permitido: 50MB"
+            )
+        # Rejeitar conteúdo que não é XML antes de acionar o parser
+        if not _looks_like_xml(content):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Arquivo deve ser um XML válido: {xml_file.filename}"
+            )
+        documents.append(content)
+    
+    try:
+        return await _process_batch(documents, batch_size, timeout_minutes, http_request)
         
     except Exception as e:
         logger.error(
             "batch_creation_error",
             error=str(e),
-            documents_count=len(request.documents) if request.documents else 0
+            documents_count=len(xml_files)
         )
         raise HTTPException(
             status_code=500,
@@ -151,31 +398,30 @@ async def process_batch_documents(
 
 @router.get("/validate")
 async def validate_xml_structure(
-    xml_file: UploadFile = File(..., description="Arquivo XML para validação")
-) -> JSONResponse:
+    xml_file: UploadFile = File(..., description="Arquivo XML para validação"),
+    processor: XMLProcessor = Depends(get_processor)
+) -> Dict[str, Any]:
     """
     Valida estrutura de um arquivo XML fiscal.
     
     Args:
         xml_file: Arquivo XML para validação
+        processor: Processador XML compartilhado (injetado)
         
     Returns:
         Resultado da validação
     """
     try:
-        # Ler conteúdo
-        xml_content = await xml_file.read()
-        xml_string = xml_content.decode('utf-8')
-        
-        # Validar estrutura
-        processor = XMLProcessor()
-        from app.models.fiscal import DocumentType
-        is_valid = processor.validate_xml_structure(xml_string, DocumentType.NFE)
+        # Validar estrutura em streaming, sem carregar o arquivo em memória
+        is_valid = await to_thread.run_sync(
+            processor.validate_xml_stream, xml_file.file, DocumentType.NFE
+        )
+        file_size = xml_file.size if xml_file.size is not None else xml_file.file.seek(0, 2)
         
         result = {
             "valid": is_valid,
             "filename": xml_file.filename,
-            "file_size": len(xml_content),
+            "file_size": file_size,
             "message": "XML válido" if is_valid else "XML inválido ou estrutura incorreta"
         }
         
@@ -183,10 +429,10 @@ async def validate_xml_structure(
             "xml_validation_completed",
             filename=xml_file.filename,
             valid=is_valid,
-            file_size=len(xml_content)
+            file_size=file_size
         )
         
-        return JSONResponse(content=result)
+        return result
         
     except Exception as e:
         logger.error(
@@ -201,7 +447,7 @@ async def validate_xml_structure(
 
 
 @router.get("/{document_id}/result", response_model=DocumentProcessingResult)
-async def get_document_result(document_id: UUID) -> DocumentProcessingResult:
+async def get_document_result(document_id: UUID) -> Response:
     """
     Obtém resultado do processamento de um documento específico.
     
@@ -214,9 +460,6 @@ async def get_document_result(document_id: UUID) -> DocumentProcessingResult:
     # TODO: Implementar busca real no banco de dados
     # Por enquanto, retornar dados simulados
     
-    from decimal import Decimal
-    from datetime import datetime
-    
     result = DocumentProcessingResult(
         document_id=document_id,
         document_key="41250115495505000141550010001278001000921722",
@@ -237,5 +480,5 @@ async def get_document_result(document_id: UUID) -> DocumentProcessingResult:
         status=result.status
     )
     
-    return result
+    return Response(content=result.model_dump_json(), media_type="application/json")
 
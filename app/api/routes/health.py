@@ -2,8 +2,9 @@
 Endpoints de health check e status da aplicação.
 """
 
-from datetime import datetime
-from typing import Dict
+import time
+from datetime import datetime, timezone
+from typing import Dict, Tuple
 
 from fastapi import APIRouter
 
@@ -11,6 +12,34 @@ from app.core import settings
 
 router = APIRouter(tags=["health"])
 
+# Identificação do serviço (imutável durante a execução)
+_SERVICE_INFO = {
+    "version": settings.app_version,
+    "service": settings.app_name
+}
+
+# Último timestamp formatado: (segundo epoch, string ISO)
+_last_timestamp: Tuple[int, str] = (0, "")
+
+
+def _iso_now() -> str:
+    """
+    Retorna o timestamp UTC atual em ISO 8601 com granularidade de segundo.
+    
+    A string é formatada no máximo uma vez por segundo, evitando
+    alocações a cada chamada das probes de health check.
+    
+    Returns:
+        str: Timestamp ISO 8601 (UTC)
+    """
+    global _last_timestamp
+    second = int(time.time())
+    cached_second, cached_value = _last_timestamp
+    if cached_second != second:
+        cached_value = datetime.fromtimestamp(second, timezone.utc).replace(tzinfo=None).isoformat()
+        _last_timestamp = (second, cached_value)
+    return cached_value
+
 
 @router.get("/health")
 async def health_check() -> Dict[str, str]:
@@ -22,9 +51,8 @@ async def health_check() -> Dict[str, str]:
     """
     return {
         "status": "healthy",
-        "timestamp": datetime.utcnow().isoformat(),
-        "version": settings.app_version,
-        "service": settings.app_name
+        "timestamp": _iso_now(),
+        **_SERVICE_INFO
     }
 
 
@@ -40,7 +68,7 @@ async def readiness_check() -> Dict[str, str]:
     
     return {
         "status": "ready",
-        "timestamp": datetime.utcnow().isoformat(),
+        "timestamp": _iso_now(),
         "checks": {
             "database": "ok",  # TODO: Implementar check real
             "government_api": "ok"  # TODO: Implementar check real
@@ -2,12 +2,12 @@
 Endpoints para gerenciamento de jobs de processamento.
 """
 
-from datetime import datetime
-from typing import List
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, List
 from uuid import UUID
 
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
 
 from app.core.logging import get_logger
 from app.models.fiscal import ProcessingJob, JobStatus
@@ -34,8 +34,6 @@ async def get_job_status(job_id: UUID) -> ProcessingJob:
         # TODO: Implementar busca real no banco de dados
         # Por enquanto, simular job em execução
         
-        from datetime import datetime, timedelta
-        
         job = ProcessingJob(
             id=job_id,
             status=JobStatus.RUNNING,
@@ -71,7 +69,7 @@ async def get_job_status(job_id: UUID) -> ProcessingJob:
 
 
 @router.get("/{job_id}/cancel")
-async def cancel_job(job_id: UUID) -> JSONResponse:
+async def cancel_job(job_id: UUID) -> Dict[str, str]:
     """
     Cancela um job de processamento em execução.
     
@@ -89,13 +87,11 @@ async def cancel_job(job_id: UUID) -> JSONResponse:
             job_id=str(job_id)
         )
         
-        return JSONResponse(
-            content={
-                "message": "Job cancelado com sucesso",
-                "job_id": str(job_id),
-                "cancelled_at": datetime.utcnow().isoformat()
-            }
-        )
+        return {
+            "message": "Job cancelado com sucesso",
+            "job_id": str(job_id),
+            "cancelled_at": datetime.utcnow().isoformat()
+        }
         
     except Exception as e:
         logger.error(
@@ -130,8 +126,6 @@ async def list_jobs(
         # TODO: Implementar busca real no banco de dados
         # Por enquanto, retornar lista simulada
         
-        from datetime import datetime, timedelta
-        
         jobs = [
             ProcessingJob(
                 status=JobStatus.COMPLETED,
@@ -161,12 +155,15 @@ async def list_jobs(
             )
         ]
         
-        # Filtrar por status se especificado
-        if status:
-            jobs = [job for job in jobs if job.status == status]
+        # Indexar por status (uma única passagem sobre os jobs)
+        jobs_by_status: Dict[JobStatus, List[ProcessingJob]] = {}
+        for job in jobs:
+            jobs_by_status.setdefault(job.status, []).append(job)
         
-        # Aplicar paginação
-        jobs = jobs[offset:offset + limit]
+        # Filtrar por status se especificado e aplicar paginação
+        source = jobs_by_status.get(status, []) if status else jobs
+        start = max(offset, 0)
+        jobs = list(islice(source, start, start + max(limit, 0)))
         
         logger.info(
             "jobs_listed",
@@ -6,20 +6,107 @@ de dados de documentos XML fiscais, com suporte a diferentes formatos e
 validações robustas.
 """
 
-from typing import Dict, List, Optional
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 
+from app.core import settings
 from app.core.logging import get_logger
 from app.models.fiscal import DocumentType, NFEDocument
-from app.services.xml_processor import XMLProcessor, XMLProcessingError
+from app.services.xml_processor import (
+    XMLProcessor,
+    XMLProcessingError,
+    extract_document_summary_worker,
+    get_processor,
+    parse_xml
+)
 
 router = APIRouter(prefix="/xml", tags=["xml-reader"])
 logger = get_logger("xml_reader_api")
 
+# Constantes monetárias (Decimal em C; sem conversão para float)
+_ZERO = Decimal('0')
+_ITEMS_TOTAL_TOLERANCE = Decimal('0.01')
+
+# Tamanho máximo de arquivo aceito em /read
+_MAX_READ_SIZE = 10 * 1024 * 1024  # 10MB
+
+# Tamanho máximo por arquivo em /batch-summary
+_MAX_BATCH_FILE_SIZE = 5 * 1024 * 1024  # 5MB
+
+
+class _ByteQuota:
+    """
+    Limita a quantidade de bytes em processamento simultâneo.
+    
+    Mantém o volume de XML residente em memória limitado durante lotes
+    grandes. Um arquivo maior que a cota só é admitido quando nenhum
+    outro está em andamento.
+    """
+    
+    def __init__(self, limit: int) -> None:
+        self._limit = limit
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+    
+    def _fits(self, size: int) -> bool:
+        return self._in_flight == 0 or self._in_flight + size <= self._limit
+    
+    @asynccontextmanager
+    async def reserve(self, size: int) -> AsyncIterator[None]:
+        """
+        Reserva `size` bytes da cota enquanto o bloco estiver ativo.
+        
+        Args:
+            size: Quantidade de bytes a reservar
+        """
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._fits(size))
+            self._in_flight += size
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._in_flight -= size
+                self._condition.notify_all()
+
+
+# XML mínimo usado pelo health check do módulo
+_HEALTH_XML = b'''<?xml version="1.0" encoding="UTF-8"?>
+<nfeProc xmlns="http://www.portalfiscal.inf.br/nfe">
+    <NFe>
+        <infNFe Id="NFe12345678901234567890123456789012345678901234" versao="4.00">
+            <ide><serie>1</serie><nNF>1</nNF></ide>
+            <emit><CNPJ>12345678000195</CNPJ><xNome>Teste</xNome></emit>
+            <dest><CNPJ>98765432000198</CNPJ><xNome>Teste</xNome></dest>
+            <det nItem="1"><prod><cProd>1</cProd><xProd>Teste</xProd></prod></det>
+            <total><ICMSTot><vNF>100.00</vNF></ICMSTot></total>
+        </infNFe>
+    </NFe>
+</nfeProc>'''
+
+
+@lru_cache(maxsize=1)
+def _health_validation() -> bool:
+    """
+    Valida o XML do health check uma única vez por processo.
+    
+    Falhas não são memorizadas, então a próxima sonda tenta novamente.
+    
+    Returns:
+        bool: Se a validação de estrutura funcionou
+    """
+    return get_processor().validate_xml_structure(_HEALTH_XML, DocumentType.NFE)
+
 
 class XMLValidationResponse(BaseModel):
     """Resposta de validação de XML."""
@@ -61,7 +148,8 @@ class XMLSummaryResponse(BaseModel):
 @router.post("/validate", response_model=XMLValidationResponse)
 async def validate_xml_structure(
     xml_file: UploadFile = File(..., description="Arquivo XML para validação"),
-    document_type: str = Form(default="nfe", description="Tipo de documento esperado")
+    document_type: str = Form(default="nfe", description="Tipo de documento esperado"),
+    processor: XMLProcessor = Depends(get_processor)
 ) -> XMLValidationResponse:
     """
     Valida estrutura de XML fiscal sem processamento completo.
@@ -72,6 +160,7 @@ async def validate_xml_structure(
     Args:
         xml_file: Arquivo XML a ser validado
         document_type: Tipo de documento esperado (nfe, nfce, cte, etc.)
+        processor: Processador XML compartilhado (injetado)
         
     Returns:
         XMLValidationResponse: Resultado da validação com detalhes
@@ -86,16 +175,20 @@ async def validate_xml_structure(
         
         # Ler conteúdo do arquivo
         xml_content = await xml_file.read()
-        xml_text = xml_content.decode('utf-8')
-        
-        # Inicializar processor
-        processor = XMLProcessor()
         
         # Determinar tipo de documento
         doc_type = DocumentType.NFE if document_type.lower() == "nfe" else DocumentType.NFE
         
+        # Parse único, reutilizado na validação, no resumo e no diagnóstico
+        root = None
+        parse_error = None
+        try:
+            root = parse_xml(xml_content)
+        except Exception as e:
+            parse_error = e
+        
         # Validar estrutura
-        is_valid = processor.validate_xml_structure(xml_text, doc_type)
+        is_valid = root is not None and processor.validate_xml_structure(root, doc_type)
         
         errors = []
         warnings = []
@@ -104,13 +197,13 @@ async def validate_xml_structure(
         if is_valid:
             try:
                 # Extrair resumo se estrutura é válida
-                summary = processor.extract_document_summary(xml_text)
+                summary = processor.extract_document_summary(root)
                 
                 # Verificar avisos
                 if summary.get('emitter_name', '') == '':
                     warnings.append("Nome do emitente não encontrado")
                 
-                if float(summary.get('total_value', '0')) == 0:
+                if Decimal(summary.get('total_value', '0')) == _ZERO:
                     warnings.append("Valor total do documento é zero")
                 
             except Exception as e:
@@ -119,30 +212,10 @@ async def validate_xml_structure(
             errors.append("Estrutura XML não conforme com layout NF-e")
             
             # Tentar identificar problemas específicos
-            try:
-                from lxml import etree
-                root = etree.fromstring(xml_content)
-                
-                if 'portalfiscal.inf.br/nfe' not in str(root.nsmap):
-                    errors.append("Namespace NF-e não encontrado")
-                
-                namespaces = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
-                
-                if root.find('.//nfe:infNFe', namespaces) is None:
-                    errors.append("Elemento infNFe não encontrado")
-                if root.find('.//nfe:ide', namespaces) is None:
-                    errors.append("Elemento ide (identificação) não encontrado")
-                if root.find('.//nfe:emit', namespaces) is None:
-                    errors.append("Elemento emit (emitente) não encontrado")
-                if root.find('.//nfe:dest', namespaces) is None:
-                    errors.append("Elemento dest (destinatário) não encontrado")
-                if root.find('.//nfe:det', namespaces) is None:
-                    errors.append("Nenhum item (det) encontrado")
-                if root.find('.//nfe:total', namespaces) is None:
-                    errors.append("Elemento total não encontrado")
-                    
-            except Exception as parse_error:
+            if parse_error is not None:
                 errors.append(f"Erro de parsing XML: {str(parse_error)}")
+            else:
+                errors.extend(processor.validator.diagnose_nfe_tree(root))
         
         logger.info(
             "xml_validation_completed",
@@ -180,7 +253,8 @@ async def validate_xml_structure(
 async def read_xml_document(
     xml_file: UploadFile = File(..., description="Arquivo XML para leitura completa"),
     extract_taxes: bool = Form(default=True, description="Se deve extrair detalhes tributários"),
-    validate_cnpj: bool = Form(default=True, description="Se deve validar CNPJs")
+    validate_cnpj: bool = Form(default=True, description="Se deve validar CNPJs"),
+    processor: XMLProcessor = Depends(get_processor)
 ) -> XMLReadResponse:
     """
     Realiza leitura completa de XML fiscal com extração de todos os dados.
@@ -192,13 +266,12 @@ async def read_xml_document(
         xml_file: Arquivo XML para processamento
         extract_taxes: Se deve extrair detalhes tributários
         validate_cnpj: Se deve validar CNPJs das empresas
+        processor: Processador XML compartilhado (injetado)
         
     Returns:
         XMLReadResponse: Documento estruturado completo
     """
-    from datetime import datetime
-    
-    start_time = datetime.utcnow()
+    start_time = time.perf_counter_ns()
     
     try:
         # Validar arquivo
@@ -208,26 +281,27 @@ async def read_xml_document(
                 detail="Arquivo deve ter extensão .xml"
             )
         
-        # Validar tamanho do arquivo (máximo 10MB)
-        xml_content = await xml_file.read()
-        if len(xml_content) > 10 * 1024 * 1024:  # 10MB
+        # Validar tamanho do arquivo (máximo 10MB) antes de carregá-lo em memória
+        if xml_file.size is not None and xml_file.size > _MAX_READ_SIZE:
             raise HTTPException(
                 status_code=413,
                 detail="Arquivo muito grande. Máximo permitido: 10MB"
             )
         
-        xml_text = xml_content.decode('utf-8')
-        
-        # Inicializar processor
-        processor = XMLProcessor()
+        xml_content = await xml_file.read()
+        if len(xml_content) > _MAX_READ_SIZE:
+            raise HTTPException(
+                status_code=413,
+                detail="Arquivo muito grande. Máximo permitido: 10MB"
+            )
         
         errors = []
         warnings = []
         document = None
         
         try:
-            # Processar documento completo
-            document = processor.process_nfe_document(xml_text)
+            # Processar documento completo (bytes entregues direto ao lxml)
+            document = processor.process_nfe_document(xml_content)
             
             # Validações adicionais se solicitadas
             if validate_cnpj:
@@ -247,8 +321,8 @@ async def read_xml_document(
                 warnings.append("Documento não possui itens")
             
             # Verificar soma dos itens vs total
-            soma_itens = sum(item.total_value for item in document.items)
-            if abs(soma_itens - document.total_products) > 0.01:
+            soma_itens = sum((item.total_value for item in document.items), _ZERO)
+            if abs(soma_itens - document.total_products) > _ITEMS_TOTAL_TOLERANCE:
                 warnings.append(
                     f"Divergência entre soma dos itens ({soma_itens}) e total de produtos ({document.total_products})"
                 )
@@ -259,7 +333,7 @@ async def read_xml_document(
             errors.append(f"Erro no processamento: {str(e)}")
         
         # Calcular tempo de processamento
-        processing_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+        processing_time = (time.perf_counter_ns() - start_time) / 1_000_000
         
         success = document is not None and len(errors) == 0
         
@@ -285,7 +359,7 @@ async def read_xml_document(
     except HTTPException:
         raise
     except Exception as e:
-        processing_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+        processing_time = (time.perf_counter_ns() - start_time) / 1_000_000
         
         logger.error(
             "xml_read_error",
@@ -306,7 +380,8 @@ async def read_xml_document(
 
 @router.post("/summary", response_model=XMLSummaryResponse)
 async def get_xml_summary(
-    xml_file: UploadFile = File(..., description="Arquivo XML para resumo rápido")
+    xml_file: UploadFile = File(..., description="Arquivo XML para resumo rápido"),
+    processor: XMLProcessor = Depends(get_processor)
 ) -> XMLSummaryResponse:
     """
     Extrai resumo rápido de XML fiscal sem processamento completo.
@@ -316,6 +391,7 @@ async def get_xml_summary(
     
     Args:
         xml_file: Arquivo XML para extração de resumo
+        processor: Processador XML compartilhado (injetado)
         
     Returns:
         XMLSummaryResponse: Resumo com dados básicos do documento
@@ -330,125 +406,26 @@ async def get_xml_summary(
         
         # Ler conteúdo
         xml_content = await xml_file.read()
-        xml_text = xml_content.decode('utf-8')
         
-        # Extrair resumo - Implementação direta para contornar problema de importação
-        try:
-            from lxml import etree
-            root = etree.fromstring(xml_content)
-            namespaces = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
-            
-            # Extrair dados básicos diretamente
-            inf_nfe = root.find('.//nfe:infNFe', namespaces)
-            document_key = inf_nfe.get('Id', '').replace('NFe', '') if inf_nfe is not None else ''
-            
-            ide = root.find('.//nfe:ide', namespaces)
-            serie = ide.find('nfe:serie', namespaces).text if ide is not None and ide.find('nfe:serie', namespaces) is not None else ''
-            numero = ide.find('nfe:nNF', namespaces).text if ide is not None and ide.find('nfe:nNF', namespaces) is not None else ''
-            
-            emit = root.find('.//nfe:emit', namespaces)
-            emitente = emit.find('nfe:xNome', namespaces).text if emit is not None and emit.find('nfe:xNome', namespaces) is not None else ''
-            
-            total = root.find('.//nfe:total/nfe:ICMSTot/nfe:vNF', namespaces)
-            valor_total = total.text if total is not None else '0.00'
-            
-            # Validar estrutura
-            processor = XMLProcessor()
-            valid_structure = processor.validate_xml_structure(xml_text, DocumentType.NFE)
-            
-            summary = {
-                'document_key': document_key,
-                'series': serie,
-                'number': numero,
-                'emitter_name': emitente,
-                'total_value': valor_total,
-                'valid_structure': valid_structure
-            }
-            
-        except Exception as e:
-            logger.error("direct_summary_extraction_failed", error=str(e))
+        # Extrair resumo em streaming (XML malformado retorna o erro no resumo)
+        summary = processor.extract_document_summary(xml_content)
+        if 'error' in summary:
+            logger.error("direct_summary_extraction_failed", error=summary['error'])
             raise HTTPException(
                 status_code=400,
-                detail=f"Erro ao extrair resumo: {str(e)}"
+                detail=f"Erro ao extrair resumo: {summary['error']}"
             )
         
-        # Extrair dados adicionais para resposta completa
-        try:
-            from lxml import etree
-            root = etree.fromstring(xml_content)
-            namespaces = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
-            
-            # Data de emissão
-            ide = root.find('.//nfe:ide', namespaces)
-            issue_date = None
-            if ide is not None:
-                dh_emi = ide.find('nfe:dhEmi', namespaces)
-                if dh_emi is not None:
-                    issue_date = dh_emi.text
-                else:
-                    d_emi = ide.find('nfe:dEmi', namespaces)
-                    if d_emi is not None:
-                        issue_date = d_emi.text
-            
-            # Dados do destinatário
-            dest = root.find('.//nfe:dest', namespaces)
-            recipient_name = ""
-            recipient_cnpj = ""
-            if dest is not None:
-                nome_elem = dest.find('nfe:xNome', namespaces)
-                cnpj_elem = dest.find('nfe:CNPJ', namespaces)
-                cpf_elem = dest.find('nfe:CPF', namespaces)
-                
-                if nome_elem is not None:
-                    recipient_name = nome_elem.text
-                if cnpj_elem is not None:
-                    recipient_cnpj = cnpj_elem.text
-                elif cpf_elem is not None:
-                    recipient_cnpj = cpf_elem.text
-            
-            # Contar itens
-            items = root.findall('.//nfe:det', namespaces)
-            items_count = len(items)
-            
-            # CNPJ do emitente
-            emit = root.find('.//nfe:emit', namespaces)
-            emitter_cnpj = ""
-            if emit is not None:
-                cnpj_elem = emit.find('nfe:CNPJ', namespaces)
-                if cnpj_elem is not None:
-                    emitter_cnpj = cnpj_elem.text
-            
-        except Exception as e:
-            logger.warning("summary_extraction_partial_failure", error=str(e))
-            issue_date = None
-            recipient_name = ""
-            recipient_cnpj = ""
-            items_count = 0
-            emitter_cnpj = ""
-        
         logger.info(
             "xml_summary_extracted",
             filename=xml_file.filename,
             document_key=summary.get('document_key', ''),
             emitter_name=summary.get('emitter_name', ''),
             total_value=summary.get('total_value', '0.00'),
-            items_count=items_count
+            items_count=summary['items_count']
         )
         
-        return XMLSummaryResponse(
-            document_key=summary.get('document_key', ''),
-            document_type="NF-e",
-            series=summary.get('series', ''),
-            number=summary.get('number', ''),
-            issue_date=issue_date,
-            emitter_name=summary.get('emitter_name', ''),
-            emitter_cnpj=emitter_cnpj,
-            recipient_name=recipient_name,
-            recipient_cnpj=recipient_cnpj,
-            total_value=summary.get('total_value', '0.00'),
-            items_count=items_count,
-            valid_structure=summary.get('valid_structure', False)
-        )
+        return XMLSummaryResponse(document_type="NF-e", **summary)
         
     except HTTPException:
         raise
@@ -467,8 +444,9 @@ async def get_xml_summary(
 
 @router.post("/batch-summary")
 async def get_batch_xml_summary(
+    request: Request,
     xml_files: List[UploadFile] = File(..., description="Lista de arquivos XML para resumo")
-) -> JSONResponse:
+) -> ORJSONResponse:
     """
     Extrai resumo de múltiplos arquivos XML de forma otimizada.
     
@@ -476,77 +454,75 @@ async def get_batch_xml_summary(
     resumos básicos, ideal para upload em lote.
     
     Args:
+        request: Requisição HTTP (acesso ao pool de processos)
         xml_files: Lista de arquivos XML
         
     Returns:
-        JSONResponse: Lista de resumos com status de cada arquivo
+        ORJSONResponse: Lista de resumos com status de cada arquivo
     """
-    import asyncio
-    from concurrent.futures import ThreadPoolExecutor
-    
     if len(xml_files) > 50:
         raise HTTPException(
             status_code=400,
             detail="Máximo de 50 arquivos por lote"
         )
     
-    results = []
-    processor = XMLProcessor()
+    # Pool de processos criado no startup; sem ele, usa o executor padrão
+    pool = getattr(request.app.state, "xml_pool", None)
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(settings.max_concurrent_jobs)
+    # Limita também o volume de bytes lidos e em processamento ao mesmo tempo
+    quota = _ByteQuota(settings.batch_max_inflight_bytes)
+    too_large = {
+        'success': False,
+        'summary': None,
+        'error': 'Arquivo muito grande para processamento em lote (máx 5MB)'
+    }
     
-    def process_single_file(file_content: bytes, filename: str) -> Dict:
-        """Processa um único arquivo XML."""
-        try:
-            xml_text = file_content.decode('utf-8')
-            summary = processor.extract_document_summary(xml_text)
-            
-            return {
-                'filename': filename,
-                'success': True,
-                'summary': summary,
-                'error': None
-            }
-        except Exception as e:
+    async def process_single_file(xml_file: UploadFile) -> Dict:
+        """Lê e processa um único arquivo XML."""
+        filename = xml_file.filename
+        if not filename.lower().endswith('.xml'):
             return {
                 'filename': filename,
                 'success': False,
                 'summary': None,
-                'error': str(e)
+                'error': 'Arquivo deve ter extensão .xml'
             }
-    
-    try:
-        # Ler todos os arquivos
-        file_contents = []
-        for xml_file in xml_files:
-            if not xml_file.filename.lower().endswith('.xml'):
-                results.append({
-                    'filename': xml_file.filename,
-                    'success': False,
-                    'summary': None,
-                    'error': 'Arquivo deve ter extensão .xml'
-                })
-                continue
-            
-            content = await xml_file.read()
-            if len(content) > 5 * 1024 * 1024:  # 5MB por arquivo em lote
-                results.append({
-                    'filename': xml_file.filename,
+        
+        # Tamanho declarado no upload; desconhecido conta como o máximo permitido
+        size = xml_file.size if xml_file.size is not None else _MAX_BATCH_FILE_SIZE
+        if size > _MAX_BATCH_FILE_SIZE:
+            return {'filename': filename, **too_large}
+        
+        async with semaphore, quota.reserve(size):
+            try:
+                content = await xml_file.read()
+                if len(content) > _MAX_BATCH_FILE_SIZE:
+                    return {'filename': filename, **too_large}
+                
+                summary = await loop.run_in_executor(
+                    pool, extract_document_summary_worker, content
+                )
+                
+                return {
+                    'filename': filename,
+                    'success': True,
+                    'summary': summary,
+                    'error': None
+                }
+            except Exception as e:
+                return {
+                    'filename': filename,
                     'success': False,
                     'summary': None,
-                    'error': 'Arquivo muito grande para processamento em lote (máx 5MB)'
-                })
-                continue
-            
-            file_contents.append((content, xml_file.filename))
-        
-        # Processar em paralelo
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = [
-                executor.submit(process_single_file, content, filename)
-                for content, filename in file_contents
-            ]
-            
-            for future in futures:
-                results.append(future.result())
+                    'error': str(e)
+                }
+    
+    try:
+        # Leitura e processamento de cada arquivo em paralelo (ordem preservada)
+        results = await asyncio.gather(
+            *(process_single_file(xml_file) for xml_file in xml_files)
+        )
         
         # Estatísticas
         successful = sum(1 for r in results if r['success'])
@@ -559,7 +535,7 @@ async def get_batch_xml_summary(
             failed=failed
         )
         
-        return JSONResponse(content={
+        return ORJSONResponse(content={
             'total_files': len(xml_files),
             'successful': successful,
             'failed': failed,
@@ -579,36 +555,18 @@ async def get_batch_xml_summary(
 
 
 @router.get("/health")
-async def xml_reader_health() -> JSONResponse:
+async def xml_reader_health() -> ORJSONResponse:
     """
     Health check específico do módulo de leitura XML.
     
     Returns:
-        JSONResponse: Status de saúde do módulo
+        ORJSONResponse: Status de saúde do módulo
     """
-    from datetime import datetime
-    
     try:
-        # Testar inicialização do processor
-        processor = XMLProcessor()
-        
-        # Testar validação com XML mínimo
-        test_xml = '''<?xml version="1.0" encoding="UTF-8"?>
-        <nfeProc xmlns="http://www.portalfiscal.inf.br/nfe">
-            <NFe>
-                <infNFe Id="NFe12345678901234567890123456789012345678901234" versao="4.00">
-                    <ide><serie>1</serie><nNF>1</nNF></ide>
-                    <emit><CNPJ>12345678000195</CNPJ><xNome>Teste</xNome></emit>
-                    <dest><CNPJ>98765432000198</CNPJ><xNome>Teste</xNome></dest>
-                    <det nItem="1"><prod><cProd>1</cProd><xProd>Teste</xProd></prod></det>
-                    <total><ICMSTot><vNF>100.00</vNF></ICMSTot></total>
-                </infNFe>
-            </NFe>
-        </nfeProc>'''
-        
-        is_valid = processor.validate_xml_structure(test_xml, DocumentType.NFE)
-        
-        return JSONResponse(content={
+        # Processor e validação do XML mínimo são avaliados uma vez e reutilizados
+        is_valid = _health_validation()
+        
+        return ORJSONResponse(content={
             'status': 'healthy',
             'module': 'xml_reader',
             'processor_initialized': True,
@@ -618,7 +576,7 @@ async def xml_reader_health() -> JSONResponse:
         
     except Exception as e:
         logger.error("xml_reader_health_check_failed", error=str(e))
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=503,
             content={
                 'status': 'unhealthy',
@@ -4,8 +4,17 @@ Módulo core da aplicação.
 Contém configurações, logging, e utilitários centrais.
 """
 
-from app.core.config import settings
+from typing import Any
+
+from app.core.config import get_settings
 from app.core.logging import configure_logging, get_logger
 
-__all__ = ["settings", "configure_logging", "get_logger"]
+__all__ = ["settings", "get_settings", "configure_logging", "get_logger"]
+
+
+def __getattr__(name: str) -> Any:
+    """Resolve `settings` sob demanda, mantendo `from app.core import settings`."""
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
@@ -0,0 +1,63 @@
+"""
+Cache em memória compartilhado pelos serviços da aplicação.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+
+class LRUCache:
+    """
+    Cache LRU thread-safe com número máximo de entradas e TTL opcional.
+    
+    Com max_bytes, o total dos tamanhos informados em set() também é
+    limitado: entradas antigas são descartadas até o total caber.
+    """
+    
+    def __init__(
+        self,
+        maxsize: int,
+        ttl_seconds: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ):
+        self._maxsize = maxsize
+        self._ttl = ttl_seconds
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Retorna o valor em cache (ou None) e o marca como mais recente."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value, size = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self._bytes -= size
+                return None
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key: Hashable, value: Any, size: int = 0) -> None:
+        """Armazena o valor, descartando as entradas menos recentes se cheio."""
+        if self._maxsize <= 0:
+            return
+        # Entrada maior que o limite inteiro nunca caberia no cache
+        if self._max_bytes is not None and size > self._max_bytes:
+            return
+        expires_at = time.monotonic() + self._ttl if self._ttl else float('inf')
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._data[key] = (expires_at, value, size)
+            self._bytes += size
+            while len(self._data) > self._maxsize or (
+                self._max_bytes is not None and self._bytes > self._max_bytes
+            ):
+                self._bytes -= self._data.popitem(last=False)[1][2]
@@ -5,9 +5,11 @@ Este módulo centraliza todas as configurações da aplicação usando Pydantic
 permitindo carregamento automático de variáveis de ambiente com validação de tipos.
 """
 
-from typing import Optional
+import os
+from functools import cached_property, lru_cache
+from typing import Any, Optional
 from pydantic import Field
-from pydantic_settings import BaseSettings
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
@@ -16,8 +18,16 @@ class Settings(BaseSettings):
     
     Utiliza Pydantic Settings para validação automática de tipos e carregamento
     de configurações a partir de variáveis de ambiente ou arquivo .env.
+    A instância é imutável e pode ser compartilhada entre threads.
     """
     
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        case_sensitive=False,
+        frozen=True,
+        extra="ignore"
+    )
+    
     # === CONFIGURAÇÕES DA APLICAÇÃO ===
     app_name: str = Field(default="Fiscal XML API", alias="APP_NAME")
     app_version: str = Field(default="0.1.0", alias="APP_VERSION")
@@ -27,6 +37,8 @@ class Settings(BaseSettings):
     # === CONFIGURAÇÕES DO SERVIDOR ===
     host: str = Field(default="0.0.0.0", alias="HOST")
     port: int = Field(default=8000, alias="PORT")
+    # Log de acesso do uvicorn (os eventos estruturados já registram o processamento)
+    access_log: bool = Field(default=False, alias="ACCESS_LOG")
     
     # === CONFIGURAÇÕES DO BANCO DE DADOS ===
     database_url: str = Field(
@@ -41,6 +53,14 @@ class Settings(BaseSettings):
     )
     government_api_timeout: int = Field(default=30, alias="GOVERNMENT_API_TIMEOUT")
     government_api_retry_attempts: int = Field(default=3, alias="GOVERNMENT_API_RETRY_ATTEMPTS")
+    # Requisições simultâneas à API governamental por documento
+    government_api_concurrency: int = Field(default=10, alias="GOVERNMENT_API_CONCURRENCY")
+    # Consulta de alíquotas IBS/CBS em lote (/calculo/ibs-cbs/batch), quando suportada
+    government_api_batch_enabled: bool = Field(default=False, alias="GOVERNMENT_API_BATCH_ENABLED")
+    government_api_batch_size: int = Field(default=500, alias="GOVERNMENT_API_BATCH_SIZE")
+    # Cache de alíquotas por (NCM, CFOP, UF origem, UF destino, data)
+    tax_rate_cache_size: int = Field(default=50_000, alias="TAX_RATE_CACHE_SIZE")
+    tax_rate_cache_ttl_seconds: int = Field(default=86_400, alias="TAX_RATE_CACHE_TTL_SECONDS")
     
     # === CONFIGURAÇÕES DE SEGURANÇA ===
     secret_key: str = Field(default="dev-secret-key", alias="SECRET_KEY")
@@ -50,6 +70,10 @@ class Settings(BaseSettings):
     # === CONFIGURAÇÕES DE CACHE ===
     redis_url: Optional[str] = Field(default=None, alias="REDIS_URL")
     cache_ttl_seconds: int = Field(default=3600, alias="CACHE_TTL_SECONDS")
+    # Entradas do cache em memória de documentos processados (0 desativa)
+    document_cache_size: int = Field(default=1024, alias="DOCUMENT_CACHE_SIZE")
+    # Limite em bytes (XML original + atualizado) do cache de documentos por processo
+    document_cache_max_bytes: int = Field(default=256 * 1024 * 1024, alias="DOCUMENT_CACHE_MAX_BYTES")
     
     # === CONFIGURAÇÕES DE MONITORAMENTO ===
     prometheus_enabled: bool = Field(default=True, alias="PROMETHEUS_ENABLED")
@@ -59,13 +83,57 @@ class Settings(BaseSettings):
     max_concurrent_jobs: int = Field(default=10, alias="MAX_CONCURRENT_JOBS")
     batch_size: int = Field(default=100, alias="BATCH_SIZE")
     processing_timeout_minutes: int = Field(default=30, alias="PROCESSING_TIMEOUT_MINUTES")
+    # Threads para parsing de XML fora do event loop (padrão: 2x o número de CPUs)
+    thread_pool_size: int = Field(
+        default_factory=lambda: (os.cpu_count() or 1) * 2,
+        alias="THREAD_POOL_SIZE"
+    )
+    # Processos para processamento de lotes de XML (padrão: número de CPUs)
+    xml_process_workers: int = Field(
+        default_factory=lambda: os.cpu_count() or 1,
+        alias="XML_PROCESS_WORKERS"
+    )
+    # Documentos enviados por chamada ao pool de processos (amortiza o pickle/IPC)
+    xml_worker_chunk_size: int = Field(default=16, alias="XML_WORKER_CHUNK_SIZE")
+    # Tempo médio estimado de processamento por documento, usado nas estimativas de lote
+    estimated_ms_per_document: int = Field(default=50, alias="ESTIMATED_MS_PER_DOCUMENT")
+    # Bytes de XML em processamento simultâneo no resumo em lote (/xml/batch-summary)
+    batch_max_inflight_bytes: int = Field(
+        default=64 * 1024 * 1024,
+        alias="BATCH_MAX_INFLIGHT_BYTES"
+    )
     
-    class Config:
-        """Configurações do Pydantic Settings."""
-        env_file = ".env"
-        case_sensitive = False
+    @cached_property
+    def log_level_name(self) -> str:
+        """Nível de log normalizado em maiúsculas (calculado uma única vez)."""
+        return self.log_level.upper()
 
 
-# Instância global das configurações - carregada automaticamente na inicialização
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Retorna as configurações da aplicação, carregadas no primeiro acesso.
+    
+    Returns:
+        Settings: Instância única das configurações
+    """
+    return Settings()
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Expõe `settings` como atributo do módulo sem carregá-lo na importação (PEP 562).
+    
+    Args:
+        name: Nome do atributo solicitado
+        
+    Returns:
+        Any: Configurações da aplicação
+        
+    Raises:
+        AttributeError: Se o atributo não existir
+    """
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
@@ -2,48 +2,86 @@
 Sistema de logging estruturado para a aplicação.
 """
 
+import atexit
 import logging
+import os
+import queue
 import sys
-from typing import Any, Dict
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
 
+import orjson
 import structlog
 from structlog.stdlib import LoggerFactory
 
-from app.core.config import settings
+from app.core.config import get_settings
+
+
+# Escrita dos registros em thread própria, fora do caminho das requisições.
+# O listener é do processo que o criou: workers do pool criados por fork
+# herdam o objeto, mas não a thread que esvazia a fila.
+_queue_listener: Optional[QueueListener] = None
+_queue_listener_pid: Optional[int] = None
+
+
+def _orjson_renderer(_: Any, __: str, event_dict: Dict[str, Any]) -> str:
+    """Serializa o evento em JSON com orjson (tipos desconhecidos viram str)."""
+    return orjson.dumps(event_dict, default=str).decode()
 
 
 def configure_logging() -> None:
     """Configura o sistema de logging estruturado."""
+    settings = get_settings()
+    
+    processors = [
+        structlog.stdlib.filter_by_level,
+        structlog.stdlib.add_logger_name,
+        structlog.stdlib.add_log_level,
+        structlog.stdlib.PositionalArgumentsFormatter(),
+        structlog.processors.TimeStamper(fmt="iso"),
+    ]
+    # Stack info apenas em modo debug, fora do caminho quente
+    if settings.debug:
+        processors.append(structlog.processors.StackInfoRenderer())
+    processors += [
+        structlog.processors.format_exc_info,
+        structlog.processors.UnicodeDecoder(),
+        _orjson_renderer
+    ]
     
     # Configurar structlog
     structlog.configure(
-        processors=[
-            structlog.stdlib.filter_by_level,
-            structlog.stdlib.add_logger_name,
-            structlog.stdlib.add_log_level,
-            structlog.stdlib.PositionalArgumentsFormatter(),
-            structlog.processors.TimeStamper(fmt="iso"),
-            structlog.processors.StackInfoRenderer(),
-            structlog.processors.format_exc_info,
-            structlog.processors.UnicodeDecoder(),
-            structlog.processors.JSONRenderer()
-        ],
+        processors=processors,
         context_class=dict,
         logger_factory=LoggerFactory(),
         wrapper_class=structlog.stdlib.BoundLogger,
         cache_logger_on_first_use=True,
     )
     
-    # Configurar logging padrão
-    logging.basicConfig(
-        format="%(message)s",
-        stream=sys.stdout,
-        level=getattr(logging, settings.log_level.upper()),
-    )
-
-
+    # Configurar logging padrão: os registros são enfileirados e a escrita no
+    # stdout é feita por um QueueListener em segundo plano
+    global _queue_listener, _queue_listener_pid
+    if _queue_listener_pid != os.getpid():
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(logging.Formatter("%(message)s"))
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        _queue_listener = QueueListener(log_queue, stream_handler)
+        _queue_listener.start()
+        _queue_listener_pid = os.getpid()
+        atexit.register(_queue_listener.stop)
+        # force: substitui o QueueHandler herdado do processo pai (fila sem listener)
+        logging.basicConfig(
+            format="%(message)s",
+            handlers=[QueueHandler(log_queue)],
+            force=True
+        )
+    logging.getLogger().setLevel(getattr(logging, settings.log_level_name))
+
+
+@lru_cache(maxsize=None)
 def get_logger(name: str) -> structlog.stdlib.BoundLogger:
-    """Retorna um logger estruturado."""
+    """Retorna um logger estruturado (um por nome, reutilizado)."""
     return structlog.get_logger(name)
 
 
@@ -5,10 +5,21 @@ Modelos de dados para documentos fiscais e tributação.
 from datetime import datetime
 from decimal import Decimal
 from enum import Enum
-from typing import List, Optional
+from typing import List, Literal, Optional
 from uuid import UUID, uuid4
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, ValidationInfo, field_validator, model_validator, validator
+
+# Divisor das alíquotas percentuais (reutilizado em todos os cálculos)
+_HUNDRED = Decimal(100)
+_ZERO = Decimal(0)
+_CENT = Decimal('0.01')
+
+# Siglas de UF aceitas (EX para operações com o exterior)
+UF = Literal[
+    "AC", "AL", "AM", "AP", "BA", "CE", "DF", "ES", "GO", "MA", "MG", "MS", "MT", "PA",
+    "PB", "PE", "PI", "PR", "RJ", "RN", "RO", "RR", "RS", "SC", "SE", "SP", "TO", "EX"
+]
 
 
 class DocumentType(str, Enum):
@@ -100,32 +111,16 @@ class TaxDetails(BaseModel):
         ge=0
     )
     
-    @validator('ibs_value', 'cbs_value', 'selective_tax_value', always=True)
-    def calculate_tax_values(cls, v, values, **kwargs):
-        """Calcula valores de tributos baseado na base e alíquota."""
-        # Obter nome do campo do info se disponível
-        info = kwargs.get('info', None)
-        field_name = info.field_name if info and hasattr(info, 'field_name') else ''
-        
-        # Fallback: tentar identificar pelo contexto dos valores
-        if not field_name:
-            # Se não conseguir identificar o campo, retornar o valor como está
-            return v if v is not None else Decimal('0')
-        
-        if field_name == 'ibs_value':
-            base = values.get('ibs_base', Decimal('0'))
-            rate = values.get('ibs_rate', Decimal('0'))
-            return base * rate / 100
-        elif field_name == 'cbs_value':
-            base = values.get('cbs_base', Decimal('0'))
-            rate = values.get('cbs_rate', Decimal('0'))
-            return base * rate / 100
-        elif field_name == 'selective_tax_value':
-            base = values.get('selective_tax_base', Decimal('0'))
-            rate = values.get('selective_tax_rate', Decimal('0'))
-            return base * rate / 100
-        
-        return v if v is not None else Decimal('0')
+    @model_validator(mode="after")
+    def calculate_tax_values(self) -> "TaxDetails":
+        """Calcula valores de tributos baseado na base e alíquota (se não informados)."""
+        if not self.ibs_value:
+            self.ibs_value = self.ibs_base * self.ibs_rate / _HUNDRED
+        if not self.cbs_value:
+            self.cbs_value = self.cbs_base * self.cbs_rate / _HUNDRED
+        if not self.selective_tax_value:
+            self.selective_tax_value = self.selective_tax_base * self.selective_tax_rate / _HUNDRED
+        return self
 
 
 class ProductItem(BaseModel):
@@ -150,7 +145,7 @@ class CompanyInfo(BaseModel):
     trade_name: Optional[str] = Field(default=None, description="Nome fantasia")
     address: str = Field(description="Endereço completo")
     city: str = Field(description="Cidade")
-    state: str = Field(description="Estado (UF)", pattern=r'^[A-Z]{2}$')
+    state: UF = Field(description="Estado (UF)")
     zip_code: str = Field(description="CEP", pattern=r'^\d{8}$')
     phone: Optional[str] = Field(default=None, description="Telefone")
     email: Optional[str] = Field(default=None, description="Email")
@@ -185,24 +180,25 @@ class NFEDocument(BaseModel):
     tax_details: TaxDetails = Field(description="Detalhes tributários do documento")
     
     # XML
-    original_xml: str = Field(description="XML original do documento")
-    updated_xml: Optional[str] = Field(default=None, description="XML atualizado")
+    original_xml: bytes = Field(description="XML original do documento (UTF-8)")
+    updated_xml: Optional[bytes] = Field(default=None, description="XML atualizado (UTF-8)")
     
     # Metadados
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: Optional[datetime] = Field(default=None)
     processing_status: ProcessingStatus = Field(default=ProcessingStatus.PENDING)
     
-    @validator('total_document', always=True)
-    def validate_total_document(cls, v, values):
+    @field_validator('total_document')
+    @classmethod
+    def validate_total_document(cls, v: Decimal, info: ValidationInfo) -> Decimal:
         """Valida se o total do documento está correto."""
-        total_products = values.get('total_products', Decimal('0'))
-        total_services = values.get('total_services', Decimal('0'))
-        expected_total = total_products + total_services
+        total_products = info.data.get('total_products', _ZERO)
+        total_services = info.data.get('total_services', _ZERO)
         
-        if abs(v - expected_total) > Decimal('0.01'):  # Tolerância de 1 centavo
+        if (v - total_products - total_services).copy_abs() > _CENT:  # Tolerância de 1 centavo
             raise ValueError(
-                f"Total do documento ({v}) não confere com soma de produtos e serviços ({expected_total})"
+                f"Total do documento ({v}) não confere com soma de produtos e serviços "
+                f"({total_products + total_services})"
             )
         
         return v
@@ -281,6 +277,7 @@ class BatchProcessingResponse(BaseModel):
     """Resposta de processamento em lote."""
     
     job_id: UUID = Field(description="ID do job criado")
+    status: JobStatus = Field(description="Status final do job")
     total_documents: int = Field(description="Total de documentos no lote")
     estimated_duration_minutes: int = Field(description="Duração estimada em minutos")
     status_url: str = Field(description="URL para acompanhar o status")
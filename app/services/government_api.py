@@ -3,18 +3,68 @@ Cliente para integração com APIs governamentais de cálculo tributário.
 """
 
 import asyncio
-from datetime import datetime, timedelta
-from decimal import Decimal
-from typing import Dict, List, Optional, Tuple
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from functools import lru_cache, partial
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, TypeVar
 from urllib.parse import urljoin
 
 import httpx
+import orjson
 from httpx import AsyncClient, Response
 
+from app.core.cache import LRUCache
 from app.core.config import settings
 from app.core.logging import LoggerMixin, log_integration_event
 from app.models.fiscal import TaxDetails
 
+T = TypeVar("T")
+
+_CENTS = Decimal("0.01")
+
+# Tentativas de conexão feitas pelo transporte httpx e espera máxima entre retries
+_CONNECT_RETRIES = 2
+_MAX_RETRY_WAIT_SECONDS = 10
+_HUNDRED = Decimal(100)
+
+
+def _apply_rate(base_value: Decimal, rate: Decimal) -> Decimal:
+    """Aplica uma alíquota percentual à base, arredondando para centavos."""
+    return (base_value * rate / _HUNDRED).quantize(_CENTS, rounding=ROUND_HALF_UP)
+
+
+@lru_cache(maxsize=2)
+def _iso_date(day: date) -> str:
+    """Formata a data como AAAA-MM-DD (memorizado por dia)."""
+    return day.isoformat()
+
+
+def _operation_date() -> str:
+    """Data da operação (UTC) enviada à API governamental."""
+    return _iso_date(datetime.utcnow().date())
+
+
+def _to_decimal(value: Any) -> Decimal:
+    """
+    Converte um valor numérico em Decimal pelo caminho mais direto.
+    
+    Decimal é reutilizado, str/int são convertidos diretamente e apenas
+    float passa por str (repr mais curta, evitando a representação binária).
+    
+    Args:
+        value: Valor a converter
+        
+    Returns:
+        Decimal: Valor convertido
+    """
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, (str, int)):
+        return Decimal(value)
+    return Decimal(str(value))
+
 
 class GovernmentAPIError(Exception):
     """Erro de integração com API governamental."""
@@ -24,29 +74,64 @@ class GovernmentAPIError(Exception):
 class GovernmentAPIClient(LoggerMixin):
     """Cliente para APIs governamentais de cálculo tributário."""
     
+    # Cliente HTTP compartilhado pelo processo (pool de conexões e HTTP/2)
+    _shared_client: Optional[AsyncClient] = None
+    
     def __init__(self):
-        self.base_url = settings.government_api_base_url
-        self.timeout = settings.government_api_timeout
         self.retry_attempts = settings.government_api_retry_attempts
         self._client: Optional[AsyncClient] = None
+        # Alíquotas e valores já consultados (mudam no máximo diariamente)
+        self._rate_cache = LRUCache(
+            settings.tax_rate_cache_size,
+            settings.tax_rate_cache_ttl_seconds
+        )
+        # Consultas em andamento, compartilhadas por chamadas com a mesma chave
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+    
+    @classmethod
+    def _get_shared_client(cls) -> AsyncClient:
+        """
+        Retorna o cliente HTTP do processo, criando-o no primeiro uso.
+        
+        Conexões TCP/TLS são mantidas entre documentos e requisições
+        simultâneas são multiplexadas via HTTP/2.
+        
+        Returns:
+            AsyncClient: Cliente HTTP compartilhado
+        """
+        if cls._shared_client is None or cls._shared_client.is_closed:
+            cls._shared_client = AsyncClient(
+                base_url=settings.government_api_base_url,
+                timeout=settings.government_api_timeout,
+                # Falhas de conexão são repetidas pelo próprio transporte
+                transport=httpx.AsyncHTTPTransport(
+                    http2=True,
+                    limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+                    retries=_CONNECT_RETRIES
+                ),
+                headers={
+                    "User-Agent": f"{settings.app_name}/{settings.app_version}",
+                    "Accept": "application/json",
+                    "Content-Type": "application/json"
+                }
+            )
+        return cls._shared_client
+    
+    @classmethod
+    async def aclose_shared(cls) -> None:
+        """Fecha o cliente HTTP compartilhado (chamado no shutdown da aplicação)."""
+        if cls._shared_client is not None:
+            await cls._shared_client.aclose()
+            cls._shared_client = None
     
     async def __aenter__(self):
         """Context manager entry."""
-        self._client = AsyncClient(
-            base_url=self.base_url,
-            timeout=self.timeout,
-            headers={
-                "User-Agent": f"{settings.app_name}/{settings.app_version}",
-                "Accept": "application/json",
-                "Content-Type": "application/json"
-            }
-        )
+        self._client = self._get_shared_client()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Context manager exit."""
-        if self._client:
-            await self._client.aclose()
+        """Context manager exit (o cliente compartilhado permanece aberto)."""
+        self._client = None
     
     async def calculate_ibs_cbs(
         self,
@@ -72,57 +157,32 @@ class GovernmentAPIClient(LoggerMixin):
         Raises:
             GovernmentAPIError: Se houver erro na API
         """
-        start_time = datetime.utcnow()
+        start_time = time.perf_counter_ns()
         
         try:
-            # Preparar payload
-            payload = {
-                "ncm": ncm,
-                "cfop": cfop,
-                "valorBase": str(base_value),
-                "ufOrigem": state_origin,
-                "ufDestino": state_destination,
-                "dataOperacao": datetime.utcnow().strftime("%Y-%m-%d")
-            }
+            operation_date = _operation_date()
             
-            # Fazer requisição com retry
-            response = await self._make_request_with_retry(
-                "POST",
-                "/calculo/ibs-cbs",
-                json=payload
+            # Alíquotas independem da base: uma consulta atende todos os itens
+            ibs_rate, cbs_rate = await self._cached(
+                ("ibs_cbs", ncm, cfop, state_origin, state_destination, operation_date),
+                lambda: self._fetch_ibs_cbs_rates(
+                    ncm, cfop, base_value, state_origin, state_destination, operation_date
+                )
             )
             
-            # Processar resposta
-            data = response.json()
-            
-            # Extrair valores calculados
-            tax_details = TaxDetails(
+            # Valores calculados localmente a partir das alíquotas; dados da API
+            # governamental são confiáveis, então a validação do modelo é dispensada
+            return TaxDetails.model_construct(
                 ibs_base=base_value,
-                ibs_rate=Decimal(str(data.get("aliquotaIBS", "0"))),
-                ibs_value=Decimal(str(data.get("valorIBS", "0"))),
+                ibs_rate=ibs_rate,
+                ibs_value=_apply_rate(base_value, ibs_rate),
                 cbs_base=base_value,
-                cbs_rate=Decimal(str(data.get("aliquotaCBS", "0"))),
-                cbs_value=Decimal(str(data.get("valorCBS", "0")))
-            )
-            
-            duration_ms = (datetime.utcnow() - start_time).total_seconds() * 1000
-            
-            log_integration_event(
-                "ibs_cbs_calculated",
-                "government_api",
-                "/calculo/ibs-cbs",
-                response.status_code,
-                duration_ms,
-                ncm=ncm,
-                cfop=cfop,
-                ibs_value=float(tax_details.ibs_value),
-                cbs_value=float(tax_details.cbs_value)
+                cbs_rate=cbs_rate,
+                cbs_value=_apply_rate(base_value, cbs_rate)
             )
             
-            return tax_details
-            
         except httpx.HTTPStatusError as e:
-            duration_ms = (datetime.utcnow() - start_time).total_seconds() * 1000
+            duration_ms = (time.perf_counter_ns() - start_time) / 1_000_000
             
             log_integration_event(
                 "ibs_cbs_calculation_failed",
@@ -137,7 +197,7 @@ class GovernmentAPIClient(LoggerMixin):
                 f"Erro na API governamental: {e.response.status_code} - {e.response.text}"
             )
         except Exception as e:
-            duration_ms = (datetime.utcnow() - start_time).total_seconds() * 1000
+            duration_ms = (time.perf_counter_ns() - start_time) / 1_000_000
             
             self.logger.error(
                 "ibs_cbs_calculation_error",
@@ -149,6 +209,242 @@ class GovernmentAPIClient(LoggerMixin):
             
             raise GovernmentAPIError(f"Erro no cálculo IBS/CBS: {str(e)}")
     
+    async def _fetch_ibs_cbs_rates(
+        self,
+        ncm: str,
+        cfop: str,
+        base_value: Decimal,
+        state_origin: str,
+        state_destination: str,
+        operation_date: str
+    ) -> Tuple[Decimal, Decimal]:
+        """
+        Consulta as alíquotas de IBS e CBS na API governamental.
+        
+        Args:
+            ncm: Código NCM do produto
+            cfop: Código CFOP da operação
+            base_value: Valor base enviado na consulta
+            state_origin: Estado de origem (UF)
+            state_destination: Estado de destino (UF)
+            operation_date: Data da operação (AAAA-MM-DD)
+            
+        Returns:
+            Tupla com (alíquota IBS, alíquota CBS)
+        """
+        start_time = time.perf_counter_ns()
+        
+        payload = {
+            "ncm": ncm,
+            "cfop": cfop,
+            "valorBase": str(base_value),
+            "ufOrigem": state_origin,
+            "ufDestino": state_destination,
+            "dataOperacao": operation_date
+        }
+        
+        # Fazer requisição com retry
+        response = await self._post_json(
+            "/calculo/ibs-cbs",
+            payload
+        )
+        
+        # orjson entrega números como float; _to_decimal usa a representação
+        # mais curta (repr), preservando o literal original
+        data = orjson.loads(response.content)
+        ibs_rate = _to_decimal(data.get("aliquotaIBS") or 0)
+        cbs_rate = _to_decimal(data.get("aliquotaCBS") or 0)
+        
+        duration_ms = (time.perf_counter_ns() - start_time) / 1_000_000
+        
+        log_integration_event(
+            "ibs_cbs_rates_fetched",
+            "government_api",
+            "/calculo/ibs-cbs",
+            response.status_code,
+            duration_ms,
+            ncm=ncm,
+            cfop=cfop,
+            ibs_rate=float(ibs_rate),
+            cbs_rate=float(cbs_rate)
+        )
+        
+        return ibs_rate, cbs_rate
+    
+    async def calculate_ibs_cbs_batch(
+        self,
+        items: List[Tuple[str, str, Decimal]],
+        state_origin: str,
+        state_destination: str
+    ) -> List[TaxDetails]:
+        """
+        Calcula IBS e CBS para vários itens com consultas em lote.
+        
+        Apenas combinações (NCM, CFOP) ainda fora do cache são enviadas,
+        em páginas de até `GOVERNMENT_API_BATCH_SIZE` itens.
+        
+        Args:
+            items: Lista de (NCM, CFOP, valor base) dos itens
+            state_origin: Estado de origem (UF)
+            state_destination: Estado de destino (UF)
+            
+        Returns:
+            Detalhes tributários calculados, na ordem dos itens
+            
+        Raises:
+            GovernmentAPIError: Se houver erro na API
+        """
+        start_time = time.perf_counter_ns()
+        operation_date = _operation_date()
+        keys = [
+            ("ibs_cbs", ncm, cfop, state_origin, state_destination, operation_date)
+            for ncm, cfop, _ in items
+        ]
+        
+        resolved: Dict[Hashable, Tuple[Decimal, Decimal]] = {}
+        missing: Dict[Hashable, Dict] = {}
+        for key, (ncm, cfop, base_value) in zip(keys, items):
+            if key in resolved or key in missing:
+                continue
+            cached = self._rate_cache.get(key)
+            if cached is not None:
+                resolved[key] = cached
+            else:
+                missing[key] = {
+                    "ncm": ncm,
+                    "cfop": cfop,
+                    "valorBase": str(base_value),
+                    "ufOrigem": state_origin,
+                    "ufDestino": state_destination,
+                    "dataOperacao": operation_date
+                }
+        
+        try:
+            if missing:
+                pending = list(missing.items())
+                size = settings.government_api_batch_size
+                pages = await asyncio.gather(*(
+                    self._fetch_ibs_cbs_rates_page(pending[i:i + size])
+                    for i in range(0, len(pending), size)
+                ))
+                for page in pages:
+                    resolved.update(page)
+        except httpx.HTTPStatusError as e:
+            duration_ms = (time.perf_counter_ns() - start_time) / 1_000_000
+            
+            log_integration_event(
+                "ibs_cbs_batch_calculation_failed",
+                "government_api",
+                "/calculo/ibs-cbs/batch",
+                e.response.status_code,
+                duration_ms,
+                error=str(e)
+            )
+            
+            raise GovernmentAPIError(
+                f"Erro na API governamental: {e.response.status_code} - {e.response.text}"
+            )
+        except GovernmentAPIError:
+            raise
+        except Exception as e:
+            raise GovernmentAPIError(f"Erro no cálculo IBS/CBS em lote: {str(e)}")
+        
+        item_taxes = []
+        for key, (_, _, base_value) in zip(keys, items):
+            ibs_rate, cbs_rate = resolved[key]
+            item_taxes.append(TaxDetails.model_construct(
+                ibs_base=base_value,
+                ibs_rate=ibs_rate,
+                ibs_value=_apply_rate(base_value, ibs_rate),
+                cbs_base=base_value,
+                cbs_rate=cbs_rate,
+                cbs_value=_apply_rate(base_value, cbs_rate)
+            ))
+        return item_taxes
+    
+    async def _fetch_ibs_cbs_rates_page(
+        self,
+        page: List[Tuple[Hashable, Dict]]
+    ) -> Dict[Hashable, Tuple[Decimal, Decimal]]:
+        """
+        Consulta uma página de alíquotas IBS/CBS no endpoint em lote.
+        
+        Args:
+            page: Lista de (chave do cache, payload do item)
+            
+        Returns:
+            Alíquotas (IBS, CBS) por chave
+            
+        Raises:
+            GovernmentAPIError: Se a resposta não cobrir todos os itens
+        """
+        start_time = time.perf_counter_ns()
+        
+        response = await self._post_json(
+            "/calculo/ibs-cbs/batch",
+            {"items": [payload for _, payload in page]}
+        )
+        
+        results = orjson.loads(response.content).get("items", [])
+        if len(results) != len(page):
+            raise GovernmentAPIError(
+                f"Resposta em lote incompleta: {len(results)} de {len(page)} itens"
+            )
+        
+        rates = {}
+        for (key, _), result in zip(page, results):
+            rates[key] = (
+                _to_decimal(result.get("aliquotaIBS") or 0),
+                _to_decimal(result.get("aliquotaCBS") or 0)
+            )
+            self._rate_cache.set(key, rates[key])
+        
+        duration_ms = (time.perf_counter_ns() - start_time) / 1_000_000
+        
+        log_integration_event(
+            "ibs_cbs_batch_rates_fetched",
+            "government_api",
+            "/calculo/ibs-cbs/batch",
+            response.status_code,
+            duration_ms,
+            items_count=len(page)
+        )
+        
+        return rates
+    
+    async def _cached(self, key: Hashable, fetch: Callable[[], Awaitable[T]]) -> T:
+        """
+        Retorna o valor em cache para a chave ou o obtém via `fetch`.
+        
+        Chamadas simultâneas com a mesma chave compartilham uma única
+        consulta; falhas não são armazenadas.
+        
+        Args:
+            key: Chave da consulta
+            fetch: Função que realiza a consulta na API
+            
+        Returns:
+            Valor em cache ou recém-consultado
+        """
+        cached = self._rate_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(fetch())
+            self._pending[key] = pending
+            
+            def _done(future: asyncio.Future) -> None:
+                self._pending.pop(key, None)
+                if not future.cancelled() and future.exception() is None:
+                    self._rate_cache.set(key, future.result())
+            
+            pending.add_done_callback(_done)
+        
+        # shield: o cancelamento de um chamador não cancela a consulta compartilhada
+        return await asyncio.shield(pending)
+    
     async def calculate_selective_tax(
         self,
         ncm: str,
@@ -166,43 +462,18 @@ class GovernmentAPIClient(LoggerMixin):
         Returns:
             Valor do Imposto Seletivo calculado
         """
-        start_time = datetime.utcnow()
+        start_time = time.perf_counter_ns()
         
         try:
-            # Preparar payload
-            payload = {
-                "ncm": ncm,
-                "valorBase": str(base_value),
-                "tipoProduto": product_type,
-                "dataOperacao": datetime.utcnow().strftime("%Y-%m-%d")
-            }
+            operation_date = _operation_date()
             
-            # Fazer requisição
-            response = await self._make_request_with_retry(
-                "POST",
-                "/calculo/imposto-seletivo",
-                json=payload
+            return await self._cached(
+                ("selective", ncm, base_value, product_type, operation_date),
+                lambda: self._fetch_selective_tax(ncm, base_value, product_type, operation_date)
             )
             
-            data = response.json()
-            selective_tax_value = Decimal(str(data.get("valorImpostoSeletivo", "0")))
-            
-            duration_ms = (datetime.utcnow() - start_time).total_seconds() * 1000
-            
-            log_integration_event(
-                "selective_tax_calculated",
-                "government_api",
-                "/calculo/imposto-seletivo",
-                response.status_code,
-                duration_ms,
-                ncm=ncm,
-                selective_tax_value=float(selective_tax_value)
-            )
-            
-            return selective_tax_value
-            
         except Exception as e:
-            duration_ms = (datetime.utcnow() - start_time).total_seconds() * 1000
+            duration_ms = (time.perf_counter_ns() - start_time) / 1_000_000
             
             self.logger.error(
                 "selective_tax_calculation_error",
@@ -214,6 +485,57 @@ class GovernmentAPIClient(LoggerMixin):
             # Retornar zero em caso de erro (fallback)
             return Decimal("0")
     
+    async def _fetch_selective_tax(
+        self,
+        ncm: str,
+        base_value: Decimal,
+        product_type: str,
+        operation_date: str
+    ) -> Decimal:
+        """
+        Consulta o valor do Imposto Seletivo na API governamental.
+        
+        Args:
+            ncm: Código NCM do produto
+            base_value: Valor base para cálculo
+            product_type: Tipo de produto (bebidas, fumo, etc.)
+            operation_date: Data da operação (AAAA-MM-DD)
+            
+        Returns:
+            Valor do Imposto Seletivo calculado
+        """
+        start_time = time.perf_counter_ns()
+        
+        payload = {
+            "ncm": ncm,
+            "valorBase": str(base_value),
+            "tipoProduto": product_type,
+            "dataOperacao": operation_date
+        }
+        
+        # Fazer requisição
+        response = await self._post_json(
+            "/calculo/imposto-seletivo",
+            payload
+        )
+        
+        data = orjson.loads(response.content)
+        selective_tax_value = _to_decimal(data.get("valorImpostoSeletivo") or 0)
+        
+        duration_ms = (time.perf_counter_ns() - start_time) / 1_000_000
+        
+        log_integration_event(
+            "selective_tax_calculated",
+            "government_api",
+            "/calculo/imposto-seletivo",
+            response.status_code,
+            duration_ms,
+            ncm=ncm,
+            selective_tax_value=float(selective_tax_value)
+        )
+        
+        return selective_tax_value
+    
     async def validate_xml_structure(self, xml_content: str) -> Dict[str, any]:
         """
         Valida estrutura XML através da API governamental.
@@ -224,7 +546,7 @@ class GovernmentAPIClient(LoggerMixin):
         Returns:
             Resultado da validação
         """
-        start_time = datetime.utcnow()
+        start_time = time.perf_counter_ns()
         
         try:
             # Preparar payload
@@ -234,15 +556,14 @@ class GovernmentAPIClient(LoggerMixin):
             }
             
             # Fazer requisição
-            response = await self._make_request_with_retry(
-                "POST",
+            response = await self._post_json(
                 "/validacao/xml",
-                json=payload
+                payload
             )
             
-            data = response.json()
+            data = orjson.loads(response.content)
             
-            duration_ms = (datetime.utcnow() - start_time).total_seconds() * 1000
+            duration_ms = (time.perf_counter_ns() - start_time) / 1_000_000
             
             log_integration_event(
                 "xml_validation_completed",
@@ -256,7 +577,7 @@ class GovernmentAPIClient(LoggerMixin):
             return data
             
         except Exception as e:
-            duration_ms = (datetime.utcnow() - start_time).total_seconds() * 1000
+            duration_ms = (time.perf_counter_ns() - start_time) / 1_000_000
             
             self.logger.error(
                 "xml_validation_error",
@@ -271,6 +592,23 @@ class GovernmentAPIClient(LoggerMixin):
                 "avisos": []
             }
     
+    async def _post_json(self, endpoint: str, payload: Dict[str, Any]) -> Response:
+        """
+        Envia um POST com corpo JSON serializado por orjson.
+        
+        Args:
+            endpoint: Endpoint da API
+            payload: Corpo da requisição
+            
+        Returns:
+            Resposta HTTP
+        """
+        return await self._make_request_with_retry(
+            "POST",
+            endpoint,
+            content=orjson.dumps(payload, default=str)
+        )
+    
     async def _make_request_with_retry(
         self,
         method: str,
@@ -309,12 +647,18 @@ class GovernmentAPIClient(LoggerMixin):
                 
                 last_exception = e
                 
+            except httpx.ConnectError as e:
+                # Já repetido pelo transporte; não multiplicar as tentativas
+                last_exception = e
+                break
+                
             except (httpx.RequestError, httpx.TimeoutException) as e:
                 last_exception = e
             
-            # Aguardar antes da próxima tentativa (backoff exponencial)
+            # Aguardar antes da próxima tentativa (backoff exponencial com jitter,
+            # evitando reenvios sincronizados após uma rajada de 429)
             if attempt < self.retry_attempts - 1:
-                wait_time = 2 ** attempt
+                wait_time = random.uniform(0, min(_MAX_RETRY_WAIT_SECONDS, 2 ** attempt))
                 await asyncio.sleep(wait_time)
                 
                 self.logger.warning(
@@ -356,39 +700,75 @@ class TaxCalculatorService(LoggerMixin):
         """
         try:
             async with self.api_client:
-                item_taxes = []
-                total_taxes = TaxDetails()
+                # Limitar requisições simultâneas à API governamental
+                semaphore = asyncio.Semaphore(settings.government_api_concurrency)
                 
-                for item in items:
-                    # Calcular IBS/CBS para o item
-                    tax_details = await self.api_client.calculate_ibs_cbs(
-                        ncm=item["ncm"],
-                        cfop=item["cfop"],
-                        base_value=Decimal(str(item["total_value"])),
-                        state_origin=emitter_state,
-                        state_destination=recipient_state
-                    )
-                    
-                    # Calcular Imposto Seletivo se aplicável
-                    selective_tax = await self.api_client.calculate_selective_tax(
-                        ncm=item["ncm"],
-                        base_value=Decimal(str(item["total_value"]))
+                async def bounded(call: Callable[[], Awaitable[T]]) -> T:
+                    async with semaphore:
+                        return await call()
+                
+                # Itens idênticos (NCM, CFOP, valor) são calculados uma única vez
+                item_keys = [
+                    (item["ncm"], item["cfop"], _to_decimal(item["total_value"]))
+                    for item in items
+                ]
+                unique_keys = list(dict.fromkeys(item_keys))
+                
+                # Disparar os cálculos dos itens distintos em paralelo
+                if settings.government_api_batch_enabled:
+                    # IBS/CBS do documento inteiro em poucas requisições em lote
+                    ibs_job = self.api_client.calculate_ibs_cbs_batch(
+                        unique_keys,
+                        emitter_state,
+                        recipient_state
                     )
-                    
+                else:
+                    ibs_job = asyncio.gather(*(
+                        bounded(partial(
+                            self.api_client.calculate_ibs_cbs,
+                            ncm=ncm,
+                            cfop=cfop,
+                            base_value=base_value,
+                            state_origin=emitter_state,
+                            state_destination=recipient_state
+                        ))
+                        for ncm, cfop, base_value in unique_keys
+                    ))
+                selective_job = asyncio.gather(*(
+                    bounded(partial(
+                        self.api_client.calculate_selective_tax,
+                        ncm=ncm,
+                        base_value=base_value
+                    ))
+                    for ncm, _, base_value in unique_keys
+                ))
+                unique_taxes, unique_selective = await asyncio.gather(ibs_job, selective_job)
+                
+                # Redistribuir os resultados para cada item (cópias para repetidos)
+                taxes_by_key = dict(zip(unique_keys, unique_taxes))
+                selective_by_key = dict(zip(unique_keys, unique_selective))
+                item_taxes = []
+                seen = set()
+                for key in item_keys:
+                    tax_details = taxes_by_key[key]
+                    item_taxes.append(tax_details.model_copy() if key in seen else tax_details)
+                    seen.add(key)
+                selective_taxes = [selective_by_key[key] for key in item_keys]
+                
+                # Somar aos totais em variáveis locais (uma atribuição no modelo ao final)
+                total_ibs = total_cbs = total_selective = Decimal(0)
+                for tax_details, selective_tax in zip(item_taxes, selective_taxes):
                     tax_details.selective_tax_value = selective_tax
-                    
-                    item_taxes.append(tax_details)
-                    
-                    # Somar aos totais
-                    total_taxes.ibs_value += tax_details.ibs_value
-                    total_taxes.cbs_value += tax_details.cbs_value
-                    total_taxes.selective_tax_value += tax_details.selective_tax_value
+                    total_ibs += tax_details.ibs_value
+                    total_cbs += tax_details.cbs_value
+                    total_selective += selective_tax
                 
                 # Calcular total de tributos federais
-                total_taxes.total_federal_taxes = (
-                    total_taxes.ibs_value +
-                    total_taxes.cbs_value +
-                    total_taxes.selective_tax_value
+                total_taxes = TaxDetails.model_construct(
+                    ibs_value=total_ibs,
+                    cbs_value=total_cbs,
+                    selective_tax_value=total_selective,
+                    total_federal_taxes=total_ibs + total_cbs + total_selective
                 )
                 
                 self.logger.info(
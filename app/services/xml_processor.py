@@ -5,16 +5,25 @@ Este módulo implementa o processamento completo de documentos fiscais eletrôni
 incluindo parsing, validação, extração de dados e geração de XML atualizado.
 """
 
+import hashlib
+import logging
+import operator
 import re
+import threading
+import time
 from datetime import datetime
+from io import BytesIO
+from functools import lru_cache
 from decimal import Decimal
-from typing import Dict, List, Optional, Tuple
-from xml.etree.ElementTree import ParseError
+from typing import BinaryIO, Dict, List, NamedTuple, Optional, Union
+from uuid import uuid4
 
 from lxml import etree
 from lxml.etree import _Element
 
-from app.core.logging import LoggerMixin, log_processing_event
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.logging import LoggerMixin, configure_logging, log_processing_event
 from app.models.fiscal import (
     CompanyInfo,
     DocumentType,
@@ -29,807 +38,498 @@ class XMLProcessingError(Exception):
     pass
 
 
-class XMLValidator:
+class _Identification(NamedTuple):
+    """Dados de identificação (ide) extraídos da NF-e."""
+    series: int
+    number: int
+    issue_date: datetime
+
+
+class _Totals(NamedTuple):
+    """Totais (ICMSTot) extraídos da NF-e."""
+    products: Decimal
+    services: Decimal
+    total: Decimal
+
+
+# Namespace da NF-e e elementos obrigatórios do layout (notação Clark)
+_NFE_NS = 'http://www.portalfiscal.inf.br/nfe'
+_INF_NFE_TAG = f'{{{_NFE_NS}}}infNFe'
+_NFE_REQUIRED_TAGS = frozenset(
+    f'{{{_NFE_NS}}}{name}'
+    for name in ('infNFe', 'ide', 'emit', 'dest', 'det', 'total')
+)
+_IDE_TAG, _EMIT_TAG, _DEST_TAG, _DET_TAG, _TOTAL_TAG = (
+    f'{{{_NFE_NS}}}{name}' for name in ('ide', 'emit', 'dest', 'det', 'total')
+)
+
+# Filhos diretos de ide, prod, emit/dest, endereço e ICMSTot lidos pelo parser (tag Clark -> campo)
+_IDE_FIELDS = {
+    f'{{{_NFE_NS}}}{tag}': field
+    for tag, field in (
+        ('serie', 'series'), ('nNF', 'number'), ('dhEmi', 'issue_datetime'),
+        ('dEmi', 'issue_date')
+    )
+}
+_PROD_FIELDS = {
+    f'{{{_NFE_NS}}}{tag}': field
+    for tag, field in (
+        ('cProd', 'product_code'), ('xProd', 'product_name'), ('NCM', 'ncm'),
+        ('CFOP', 'cfop'), ('uCom', 'unit'), ('qCom', 'quantity'),
+        ('vUnCom', 'unit_value'), ('vProd', 'total_value')
+    )
+}
+_COMPANY_FIELDS = {
+    f'{{{_NFE_NS}}}{tag}': field
+    for tag, field in (
+        ('CNPJ', 'cnpj'), ('xNome', 'company_name'), ('xFant', 'trade_name'),
+        ('email', 'email')
+    )
+}
+_ADDRESS_FIELDS = {
+    f'{{{_NFE_NS}}}{tag}': field
+    for tag, field in (
+        ('xLgr', 'street'), ('nro', 'number'), ('xMun', 'city'), ('UF', 'state'),
+        ('CEP', 'zip_code'), ('fone', 'phone')
+    )
+}
+_TOTALS_FIELDS = {
+    f'{{{_NFE_NS}}}{tag}': field
+    for tag, field in (('vProd', 'products'), ('vServ', 'services'), ('vNF', 'total'))
+}
+# Filhos de emit/dest lidos no resumo do documento
+_SUMMARY_PARTY_FIELDS = {
+    f'{{{_NFE_NS}}}{tag}': field
+    for tag, field in (('CNPJ', 'cnpj'), ('CPF', 'cpf'), ('xNome', 'name'))
+}
+
+# Mensagens para elementos obrigatórios ausentes (na ordem do layout)
+_REQUIRED_MESSAGES = {
+    _INF_NFE_TAG: "Elemento infNFe não encontrado",
+    _IDE_TAG: "Elemento ide (identificação) não encontrado",
+    _EMIT_TAG: "Elemento emit (emitente) não encontrado",
+    _DEST_TAG: "Elemento dest (destinatário) não encontrado",
+    _DET_TAG: "Nenhum item (det) encontrado",
+    _TOTAL_TAG: "Elemento total não encontrado"
+}
+
+
+# original_xml é exposto como texto UTF-8; ASCII é subconjunto compatível
+_UTF8_ENCODINGS = frozenset({'UTF-8', 'UTF8', 'US-ASCII', 'ASCII'})
+
+# Padrões pré-compilados (apenas dígitos ASCII; str.isdigit aceita outros dígitos Unicode)
+_RE_DOCUMENT_KEY = re.compile(r'[0-9]{44}')
+_RE_CNPJ = re.compile(r'[0-9]{14}')
+
+# Pesos do módulo 11 da chave de acesso: 2..9 ciclicamente, da direita
+# para a esquerda, sobre os 43 primeiros dígitos (aqui já na ordem da chave)
+_DOCUMENT_KEY_WEIGHTS = tuple(reversed([2, 3, 4, 5, 6, 7, 8, 9] * 5 + [2, 3, 4]))
+
+# Códigos IBGE das UFs válidas na chave de acesso
+_VALID_UF_CODES = frozenset({
+    11, 12, 13, 14, 15, 16, 17, 21, 22, 23, 24, 25, 26, 27, 28, 29,
+    31, 32, 33, 35, 41, 42, 43, 50, 51, 52, 53
+})
+
+
+# Expressões XPath pré-compiladas (reutilizadas em todos os documentos)
+_NS_MAP = {'nfe': _NFE_NS}
+
+# Caminhos com mais de um passo (descendentes de passo único usam _first_descendant)
+_XP_ICMSTOT = etree.XPath('.//nfe:total/nfe:ICMSTot', namespaces=_NS_MAP)
+_XP_ICMSTOT_VNF = etree.XPath('.//nfe:total/nfe:ICMSTot/nfe:vNF', namespaces=_NS_MAP)
+
+# Filhos diretos usados na extração, buscados com find() em notação Clark
+# (sem resolver prefixos pelo mapa de namespaces a cada chamada)
+_XNOME_TAG, _ENDER_EMIT_TAG, _ENDER_DEST_TAG, _ICMSTOT_TAG, _PROD_TAG, _IMPOSTO_TAG = (
+    f'{{{_NFE_NS}}}{name}'
+    for name in ('xNome', 'enderEmit', 'enderDest', 'ICMSTot', 'prod', 'imposto')
+)
+
+
+def _first(xpath: etree.XPath, node: _Element) -> Optional[_Element]:
+    """Retorna o primeiro elemento encontrado pela expressão, ou None."""
+    result = xpath(node)
+    return result[0] if result else None
+
+
+def _first_descendant(node: _Element, tag: str) -> Optional[_Element]:
+    """Retorna o primeiro descendente com a tag (notação Clark), ou None."""
+    return next(node.iterdescendants(tag), None)
+
+
+_ZERO = Decimal('0')
+
+
+@lru_cache(maxsize=4096)
+def _parse_decimal(text: str) -> Decimal:
     """
-    Validador de estrutura e conteúdo de XML fiscal.
+    Converte texto numérico do XML em Decimal, reaproveitando valores repetidos.
     
-    Implementa validações específicas para documentos NF-e conforme
-    especificação técnica da SEFAZ.
-    """
+    Quantidades, alíquotas e valores se repetem muito entre itens ("1.0000",
+    "0.00"); como Decimal é imutável, a mesma instância pode ser compartilhada.
     
-    @staticmethod
-    def validate_nfe_structure(xml_content: str) -> bool:
-        """
-        Valida estrutura básica de NF-e conforme layout 4.00.
+    Args:
+        text: Valor numérico conforme o layout (ex.: "17.00")
         
-        Args:
-            xml_content: Conteúdo XML a ser validado
-            
-        Returns:
-            bool: True se estrutura é válida, False caso contrário
-        """
-        try:
-            root = etree.fromstring(xml_content.encode('utf-8'))
-            
-            # Verificar namespace obrigatório
-            if 'portalfiscal.inf.br/nfe' not in str(root.nsmap):
-                return False
-            
-            # Verificar elementos obrigatórios conforme layout
-            required_elements = [
-                './/nfe:infNFe',      # Informações da NF-e
-                './/nfe:ide',         # Identificação
-                './/nfe:emit',        # Emitente
-                './/nfe:dest',        # Destinatário
-                './/nfe:det',         # Detalhamento (pelo menos 1 item)
-                './/nfe:total'        # Totais
-            ]
-            
-            namespaces = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
-            
-            for element_path in required_elements:
-                if root.find(element_path, namespaces) is None:
-                    return False
-            
-            # Validar versão do layout
-            inf_nfe = root.find('.//nfe:infNFe', namespaces)
-            if inf_nfe is not None:
-                versao = inf_nfe.get('versao')
-                if versao not in ['4.00']:
-                    return False
-            
-            return True
-            
-        except (ParseError, Exception):
-            return False
+    Returns:
+        Decimal: Valor convertido
+    """
+    return Decimal(text)
+
+
+def _child_texts(parent: _Element, fields: Dict[str, str]) -> Dict[str, Optional[str]]:
+    """
+    Lê o texto dos filhos diretos de interesse em uma única passagem.
     
-    @staticmethod
-    def validate_document_key(key: str) -> bool:
-        """
-        Valida chave de acesso do documento fiscal.
-        
-        A chave deve ter 44 dígitos numéricos e seguir o padrão:
-        UF + AAMM + CNPJ + MOD + SERIE + NUMERO + CODIGO + DV
-        
-        Args:
-            key: Chave de acesso a ser validada
-            
-        Returns:
-            bool: True se chave é válida, False caso contrário
-        """
-        if not key or len(key) != 44:
-            return False
-        
-        if not key.isdigit():
-            return False
-        
-        # Validar UF (primeiros 2 dígitos)
-        uf_code = int(key[:2])
-        valid_ufs = [11, 12, 13, 14, 15, 16, 17, 21, 22, 23, 24, 25, 26, 27, 28, 29,
-                     31, 32, 33, 35, 41, 42, 43, 50, 51, 52, 53]
-        if uf_code not in valid_ufs:
-            return False
-        
-        # Validar modelo (posições 20-21)
-        modelo = key[20:22]
-        if modelo not in ['55', '65']:  # NF-e ou NFC-e
-            return False
-        
-        # TODO: Implementar validação completa do dígito verificador
-        return True
+    Compara a tag (notação Clark) de cada filho com o mapeamento, sem
+    avaliar uma expressão de busca por campo. Vale a primeira ocorrência.
     
-    @staticmethod
-    def validate_cnpj(cnpj: str) -> bool:
-        """
-        Valida CNPJ usando algoritmo oficial.
-        
-        Args:
-            cnpj: CNPJ a ser validado (apenas números)
-            
-        Returns:
-            bool: True se CNPJ é válido, False caso contrário
-        """
-        if not cnpj or len(cnpj) != 14 or not cnpj.isdigit():
-            return False
+    Args:
+        parent: Elemento cujos filhos diretos serão lidos
+        fields: Mapeamento tag Clark -> nome do campo
         
-        # Verificar sequências inválidas
-        if cnpj == cnpj[0] * 14:
-            return False
-        
-        # Calcular primeiro dígito verificador
-        weights1 = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-        sum1 = sum(int(cnpj[i]) * weights1[i] for i in range(12))
-        digit1 = 11 - (sum1 % 11)
-        if digit1 >= 10:
-            digit1 = 0
-        
-        # Calcular segundo dígito verificador
-        weights2 = [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-        sum2 = sum(int(cnpj[i]) * weights2[i] for i in range(13))
-        digit2 = 11 - (sum2 % 11)
-        if digit2 >= 10:
-            digit2 = 0
-        
-        return cnpj[-2:] == f"{digit1}{digit2}"
+    Returns:
+        Dict[str, Optional[str]]: Texto de cada campo encontrado
+    """
+    values = {}
+    for child in parent:
+        field = fields.get(child.tag)
+        if field is not None and field not in values:
+            values[field] = child.text
+    return values
 
 
-class XMLParser(LoggerMixin):
+def _empty_summary() -> Dict:
+    """Resumo do documento com os valores padrão de cada campo."""
+    return {
+        'document_key': '',
+        'series': '',
+        'number': '',
+        'issue_date': None,
+        'emitter_name': '',
+        'emitter_cnpj': '',
+        'recipient_name': '',
+        'recipient_cnpj': '',
+        'total_value': '0.00',
+        'items_count': 0
+    }
+
+
+def _summary_block(summary: Dict, tag: str, elem: _Element) -> None:
     """
-    Parser especializado para documentos XML fiscais.
+    Preenche no resumo os campos de um bloco do documento.
+    
+    Usado tanto na leitura em streaming quanto na árvore já parseada.
     
-    Extrai dados estruturados de XMLs NF-e usando lxml para performance
-    otimizada e suporte completo a namespaces.
+    Args:
+        summary: Resumo em construção (alterado no lugar)
+        tag: Tag (notação Clark) do bloco: ide, emit, dest ou total
+        elem: Elemento do bloco
     """
+    if tag == _IDE_TAG:
+        values = _child_texts(elem, _IDE_FIELDS)
+        summary['series'] = values.get('series') or ''
+        summary['number'] = values.get('number') or ''
+        summary['issue_date'] = values.get('issue_datetime') or values.get('issue_date')
+    elif tag == _EMIT_TAG:
+        values = _child_texts(elem, _SUMMARY_PARTY_FIELDS)
+        summary['emitter_name'] = values.get('name') or ''
+        summary['emitter_cnpj'] = values.get('cnpj') or ''
+    elif tag == _DEST_TAG:
+        values = _child_texts(elem, _SUMMARY_PARTY_FIELDS)
+        summary['recipient_name'] = values.get('name') or ''
+        summary['recipient_cnpj'] = values.get('cnpj') or values.get('cpf') or ''
+    elif tag == _TOTAL_TAG:
+        icms_tot = elem.find(_ICMSTOT_TAG)
+        if icms_tot is not None:
+            summary['total_value'] = _child_texts(icms_tot, _TOTALS_FIELDS).get('total') or '0.00'
+
+
+# Opções comuns a todos os parsers de XML fiscal (DOM e iterparse): sem
+# resolução de entidades nem acesso à rede (proteção contra XXE), sem tabela
+# de IDs (não usamos xml:id/getElementById) e sem nós de texto em branco.
+XML_PARSER_OPTIONS = {
+    'collect_ids': False,
+    'huge_tree': False,
+    'remove_blank_text': True,
+    'resolve_entities': False,
+    'no_network': True
+}
+
+
+# Parsers lxml não são thread-safe: cada thread mantém sua própria instância,
+# criada uma única vez e reutilizada em todos os documentos processados.
+_parser_local = threading.local()
+
+
+def _get_xml_parser() -> etree.XMLParser:
+    """
+    Retorna o parser lxml reutilizável da thread atual.
     
-    def __init__(self):
-        self.namespaces = {
-            'nfe': 'http://www.portalfiscal.inf.br/nfe'
-        }
+    Configurado com XML_PARSER_OPTIONS.
     
-    def parse_nfe_document(self, xml_content: str) -> NFEDocument:
-        """
-        Converte XML NF-e em modelo de dados estruturado.
-        
-        Args:
-            xml_content: Conteúdo XML da NF-e
-            
-        Returns:
-            NFEDocument: Documento estruturado com todos os dados extraídos
-            
-        Raises:
-            XMLProcessingError: Se XML é inválido ou dados obrigatórios estão ausentes
-        """
-        try:
-            # Validar estrutura antes do processamento
-            if not XMLValidator.validate_nfe_structure(xml_content):
-                raise XMLProcessingError("Estrutura XML inválida para NF-e")
-            
-            root = etree.fromstring(xml_content.encode('utf-8'))
-            
-            # Extrair dados principais do infNFe
-            inf_nfe = root.find('.//nfe:infNFe', self.namespaces)
-            if inf_nfe is None:
-                raise XMLProcessingError("Elemento infNFe não encontrado")
-            
-            # Extrair e validar chave de acesso
-            document_key = inf_nfe.get('Id', '').replace('NFe', '')
-            if not XMLValidator.validate_document_key(document_key):
-                raise XMLProcessingError(f"Chave de documento inválida: {document_key}")
-            
-            # Extrair dados de identificação
-            ide_data = self._extract_identification(root)
-            
-            # Extrair informações de emitente e destinatário
-            emitter = self._extract_company_info(root, './/nfe:emit')
-            recipient = self._extract_company_info(root, './/nfe:dest')
-            
-            # Extrair itens do documento
-            items = self._extract_items(root)
-            if not items:
-                raise XMLProcessingError("Nenhum item encontrado no documento")
-            
-            # Extrair totais do documento
-            totals = self._extract_totals(root)
-            
-            # Extrair detalhes tributários
-            tax_details = self._extract_tax_details(root)
-            
-            # Criar documento estruturado
-            document = NFEDocument(
-                document_key=document_key,
-                document_type=DocumentType.NFE,
-                series=ide_data['series'],
-                number=ide_data['number'],
-                issue_date=ide_data['issue_date'],
-                emitter=emitter,
-                recipient=recipient,
-                items=items,
-                total_products=totals['products'],
-                total_services=totals['services'],
-                total_document=totals['total'],
-                tax_details=tax_details,
-                original_xml=xml_content
-            )
-            
-            # Log de sucesso
-            log_processing_event(
-                "xml_parsed_successfully",
-                document_key,
-                document_type="nfe",
-                items_count=len(items),
-                total_value=float(totals['total']),
-                emitter_cnpj=emitter.cnpj,
-                recipient_cnpj=recipient.cnpj
-            )
-            
-            return document
-            
-        except Exception as e:
-            self.logger.error(
-                "xml_parsing_failed",
-                error=str(e),
-                xml_length=len(xml_content),
-                error_type=type(e).__name__
-            )
-            raise XMLProcessingError(f"Erro ao processar XML: {str(e)}")
+    Returns:
+        etree.XMLParser: Parser configurado para documentos fiscais
+    """
+    parser = getattr(_parser_local, 'parser', None)
+    if parser is None:
+        parser = etree.XMLParser(**XML_PARSER_OPTIONS)
+        _parser_local.parser = parser
+    return parser
+
+
+def parse_xml(xml_content: Union[bytes, str]) -> _Element:
+    """
+    Converte conteúdo XML em árvore lxml usando o parser compartilhado.
     
-    def _extract_identification(self, root: _Element) -> Dict:
-        """
-        Extrai dados de identificação do documento (elemento ide).
-        
-        Args:
-            root: Elemento raiz do XML
-            
-        Returns:
-            Dict: Dados de identificação extraídos
-            
-        Raises:
-            XMLProcessingError: Se dados obrigatórios não forem encontrados
-        """
-        ide = root.find('.//nfe:ide', self.namespaces)
-        if ide is None:
-            raise XMLProcessingError("Elemento ide não encontrado")
-        
-        # Extrair série e número
-        serie_elem = ide.find('nfe:serie', self.namespaces)
-        numero_elem = ide.find('nfe:nNF', self.namespaces)
-        
-        if serie_elem is None or numero_elem is None:
-            raise XMLProcessingError("Série ou número do documento não encontrados")
-        
-        # Extrair data de emissão (dhEmi ou dEmi para compatibilidade)
-        dh_emi = ide.find('nfe:dhEmi', self.namespaces)
-        if dh_emi is not None:
-            # Formato com hora (layout 4.00)
-            issue_date_str = dh_emi.text
-            # Remover timezone se presente para parsing
-            if '+' in issue_date_str or 'Z' in issue_date_str:
-                issue_date_str = issue_date_str.replace('Z', '+00:00')
-                issue_date = datetime.fromisoformat(issue_date_str)
-            else:
-                issue_date = datetime.fromisoformat(issue_date_str)
-        else:
-            # Fallback para dEmi (formato antigo)
-            d_emi = ide.find('nfe:dEmi', self.namespaces)
-            if d_emi is not None:
-                issue_date = datetime.strptime(d_emi.text, '%Y-%m-%d')
-            else:
-                raise XMLProcessingError("Data de emissão não encontrada")
-        
-        # Extrair dados adicionais
-        natureza_op = ide.find('nfe:natOp', self.namespaces)
-        modelo = ide.find('nfe:mod', self.namespaces)
-        
-        return {
-            'series': int(serie_elem.text),
-            'number': int(numero_elem.text),
-            'issue_date': issue_date,
-            'natureza_operacao': natureza_op.text if natureza_op is not None else None,
-            'modelo': modelo.text if modelo is not None else '55'
-        }
+    A árvore não é alterada: declarações de namespace, mesmo sem uso, são
+    preservadas no XML atualizado (a C14N inclusiva da assinatura as considera).
     
-    def _extract_company_info(self, root: _Element, xpath: str) -> CompanyInfo:
-        """
-        Extrai informações de empresa (emitente ou destinatário).
-        
-        Args:
-            root: Elemento raiz do XML
-            xpath: XPath para localizar elemento da empresa
-            
-        Returns:
-            CompanyInfo: Informações estruturadas da empresa
-            
-        Raises:
-            XMLProcessingError: Se dados obrigatórios não forem encontrados
-        """
-        company_elem = root.find(xpath, self.namespaces)
-        if company_elem is None:
-            raise XMLProcessingError(f"Elemento não encontrado: {xpath}")
-        
-        # Extrair CNPJ/CPF
-        cnpj_elem = company_elem.find('nfe:CNPJ', self.namespaces)
-        cpf_elem = company_elem.find('nfe:CPF', self.namespaces)
-        
-        if cnpj_elem is not None:
-            documento = cnpj_elem.text
-            if not XMLValidator.validate_cnpj(documento):
-                self.logger.warning("cnpj_validation_failed", cnpj=documento)
-        elif cpf_elem is not None:
-            documento = cpf_elem.text
-        else:
-            raise XMLProcessingError("CNPJ/CPF não encontrado")
-        
-        # Extrair nome
-        nome_elem = company_elem.find('nfe:xNome', self.namespaces)
-        if nome_elem is None:
-            raise XMLProcessingError("Nome da empresa não encontrado")
-        
-        # Extrair endereço (diferentes padrões para emit/dest)
-        if 'emit' in xpath:
-            ender_elem = company_elem.find('nfe:enderEmit', self.namespaces)
-        else:
-            ender_elem = company_elem.find('nfe:enderDest', self.namespaces)
-        
-        if ender_elem is None:
-            # Fallback para endereco genérico
-            ender_elem = company_elem.find('nfe:endereco', self.namespaces)
+    Args:
+        xml_content: Conteúdo XML, preferencialmente em bytes
         
-        if ender_elem is None:
-            raise XMLProcessingError("Endereço não encontrado")
-        
-        # Extrair dados do endereço
-        logradouro = ender_elem.find('nfe:xLgr', self.namespaces)
-        numero = ender_elem.find('nfe:nro', self.namespaces)
-        complemento = ender_elem.find('nfe:xCpl', self.namespaces)
-        bairro = ender_elem.find('nfe:xBairro', self.namespaces)
-        municipio = ender_elem.find('nfe:xMun', self.namespaces)
-        uf = ender_elem.find('nfe:UF', self.namespaces)
-        cep = ender_elem.find('nfe:CEP', self.namespaces)
-        
-        # Montar endereço completo
-        endereco_parts = []
-        if logradouro is not None:
-            endereco_parts.append(logradouro.text)
-        if numero is not None:
-            endereco_parts.append(numero.text)
-        if complemento is not None:
-            endereco_parts.append(complemento.text)
-        if bairro is not None:
-            endereco_parts.append(bairro.text)
-        
-        endereco_completo = ', '.join(filter(None, endereco_parts))
+    Returns:
+        _Element: Elemento raiz do documento
         
-        return CompanyInfo(
-            cnpj=documento,
-            company_name=nome_elem.text,
-            trade_name=self._get_optional_text(company_elem, 'nfe:xFant'),
-            address=endereco_completo,
-            city=municipio.text if municipio is not None else '',
-            state=uf.text if uf is not None else '',
-            zip_code=cep.text if cep is not None else '',
-            phone=self._get_optional_text(ender_elem, 'nfe:fone'),
-            email=self._get_optional_text(company_elem, 'nfe:email')
-        )
+    Raises:
+        etree.XMLSyntaxError: Se o XML for malformado
+    """
+    if isinstance(xml_content, str):
+        xml_content = xml_content.encode('utf-8')
+    return etree.fromstring(xml_content, _get_xml_parser())
+
+
+def content_digest(xml_content: Union[bytes, str]) -> bytes:
+    """
+    Calcula o digest BLAKE2b (128 bits) do conteúdo XML.
     
-    def _extract_items(self, root: _Element) -> List[ProductItem]:
-        """
-        Extrai itens do documento fiscal.
-        
-        Args:
-            root: Elemento raiz do XML
-            
-        Returns:
-            List[ProductItem]: Lista de itens extraídos
-        """
-        items = []
-        det_elements = root.findall('.//nfe:det', self.namespaces)
+    Args:
+        xml_content: Conteúdo XML
         
-        for det in det_elements:
-            try:
-                item_num = int(det.get('nItem'))
-                
-                prod = det.find('nfe:prod', self.namespaces)
-                if prod is None:
-                    self.logger.warning("produto_nao_encontrado", item_number=item_num)
-                    continue
-                
-                # Extrair dados obrigatórios do produto
-                product_code = self._get_required_text(prod, 'nfe:cProd', f"Código do produto item {item_num}")
-                product_name = self._get_required_text(prod, 'nfe:xProd', f"Nome do produto item {item_num}")
-                ncm = self._get_required_text(prod, 'nfe:NCM', f"NCM item {item_num}")
-                cfop = self._get_required_text(prod, 'nfe:CFOP', f"CFOP item {item_num}")
-                unit = self._get_required_text(prod, 'nfe:uCom', f"Unidade item {item_num}")
-                
-                # Extrair valores numéricos
-                quantity_text = self._get_required_text(prod, 'nfe:qCom', f"Quantidade item {item_num}")
-                unit_value_text = self._get_required_text(prod, 'nfe:vUnCom', f"Valor unitário item {item_num}")
-                total_value_text = self._get_required_text(prod, 'nfe:vProd', f"Valor total item {item_num}")
-                
-                # Converter para Decimal para precisão fiscal
-                quantity = Decimal(quantity_text)
-                unit_value = Decimal(unit_value_text)
-                total_value = Decimal(total_value_text)
-                
-                # Extrair tributação do item
-                tax_details = self._extract_item_tax_details(det)
-                
-                # Criar item estruturado
-                item = ProductItem(
-                    item_number=item_num,
-                    product_code=product_code,
-                    product_name=product_name,
-                    ncm=ncm,
-                    cfop=cfop,
-                    unit=unit,
-                    quantity=quantity,
-                    unit_value=unit_value,
-                    total_value=total_value,
-                    tax_details=tax_details
-                )
-                
-                items.append(item)
-                
-            except Exception as e:
-                self.logger.error(
-                    "item_extraction_failed",
-                    item_number=item_num if 'item_num' in locals() else 'unknown',
-                    error=str(e)
-                )
-                # Continuar processamento dos outros itens
-                continue
-        
-        return items
+    Returns:
+        bytes: Digest usado como chave de cache
+    """
+    if isinstance(xml_content, str):
+        xml_content = xml_content.encode('utf-8')
+    return hashlib.blake2b(xml_content, digest_size=16).digest()
+
+
+class XMLValidator:
+    """
+    Validador de estrutura e conteúdo de XML fiscal.
     
-    def _extract_item_tax_details(self, det_element: _Element) -> TaxDetails:
-        """
-        Extrai detalhes tributários de um item específico.
-        
-        Args:
-            det_element: Elemento det do item
-            
-        Returns:
-            TaxDetails: Detalhes tributários extraídos
-        """
-        tax_details = TaxDetails()
-        
-        imposto = det_element.find('nfe:imposto', self.namespaces)
-        if imposto is None:
-            return tax_details
-        
-        # Extrair ICMS
-        icms = imposto.find('nfe:ICMS', self.namespaces)
-        if icms is not None:
-            # Pode ter diferentes tipos: ICMS00, ICMS10, ICMS20, etc.
-            for icms_child in icms:
-                vbc = icms_child.find('nfe:vBC', self.namespaces)
-                picms = icms_child.find('nfe:pICMS', self.namespaces)
-                vicms = icms_child.find('nfe:vICMS', self.namespaces)
-                
-                if vbc is not None:
-                    tax_details.icms_base = Decimal(vbc.text)
-                if picms is not None:
-                    tax_details.icms_rate = Decimal(picms.text)
-                if vicms is not None:
-                    tax_details.icms_value = Decimal(vicms.text)
-                break
-        
-        # Extrair PIS
-        pis = imposto.find('nfe:PIS', self.namespaces)
-        if pis is not None:
-            for pis_child in pis:
-                vbc = pis_child.find('nfe:vBC', self.namespaces)
-                ppis = pis_child.find('nfe:pPIS', self.namespaces)
-                vpis = pis_child.find('nfe:vPIS', self.namespaces)
-                
-                if vbc is not None:
-                    tax_details.pis_base = Decimal(vbc.text)
-                if ppis is not None:
-                    tax_details.pis_rate = Decimal(ppis.text)
-                if vpis is not None:
-                    tax_details.pis_value = Decimal(vpis.text)
-                break
-        
-        # Extrair COFINS
-        cofins = imposto.find('nfe:COFINS', self.namespaces)
-        if cofins is not None:
-            for cofins_child in cofins:
-                vbc = cofins_child.find('nfe:vBC', self.namespaces)
-                pcofins = cofins_child.find('nfe:pCOFINS', self.namespaces)
-                vcofins = cofins_child.find('nfe:vCOFINS', self.namespaces)
-                
-                if vbc is not None:
-                    tax_details.cofins_base = Decimal(vbc.text)
-                if pcofins is not None:
-                    tax_details.cofins_rate = Decimal(pcofins.text)
-                if vcofins is not None:
-                    tax_details.cofins_value = Decimal(vcofins.text)
-                break
-        
-        return tax_details
+    Implementa validações específicas para documentos NF-e conforme
+    especificação técnica da SEFAZ.
+    """
     
-    def _extract_totals(self, root: _Element) -> Dict[str, Decimal]:
+    @staticmethod
+    def validate_nfe_structure(xml_content: Union[bytes, str]) -> bool:
         """
-        Extrai totais do documento.
+        Valida estrutura básica de NF-e conforme layout 4.00.
         
         Args:
-            root: Elemento raiz do XML
+            xml_content: Conteúdo XML a ser validado
             
         Returns:
-            Dict: Totais extraídos do documento
-            
-        Raises:
-            XMLProcessingError: Se totais obrigatórios não forem encontrados
+            bool: True se estrutura é válida, False caso contrário
         """
-        total_elem = root.find('.//nfe:total/nfe:ICMSTot', self.namespaces)
-        if total_elem is None:
-            raise XMLProcessingError("Totais (ICMSTot) não encontrados")
-        
-        # Extrair valores obrigatórios
-        v_prod = total_elem.find('nfe:vProd', self.namespaces)
-        v_nf = total_elem.find('nfe:vNF', self.namespaces)
-        
-        if v_nf is None:
-            raise XMLProcessingError("Valor total da NF-e não encontrado")
-        
-        # Extrair valores opcionais
-        v_serv = total_elem.find('nfe:vServ', self.namespaces)
-        v_desc = total_elem.find('nfe:vDesc', self.namespaces)
-        v_frete = total_elem.find('nfe:vFrete', self.namespaces)
-        v_seg = total_elem.find('nfe:vSeg', self.namespaces)
-        v_outro = total_elem.find('nfe:vOutro', self.namespaces)
-        
-        return {
-            'products': Decimal(v_prod.text) if v_prod is not None else Decimal('0'),
-            'services': Decimal(v_serv.text) if v_serv is not None else Decimal('0'),
-            'total': Decimal(v_nf.text),
-            'discount': Decimal(v_desc.text) if v_desc is not None else Decimal('0'),
-            'freight': Decimal(v_frete.text) if v_frete is not None else Decimal('0'),
-            'insurance': Decimal(v_seg.text) if v_seg is not None else Decimal('0'),
-            'other': Decimal(v_outro.text) if v_outro is not None else Decimal('0')
-        }
+        try:
+            return XMLValidator.validate_nfe_tree(parse_xml(xml_content))
+        except Exception:
+            return False
     
-    def _extract_tax_details(self, root: _Element) -> TaxDetails:
+    @staticmethod
+    def validate_nfe_tree(root: _Element) -> bool:
         """
-        Extrai detalhes tributários consolidados do documento.
+        Valida estrutura básica de NF-e em uma árvore já parseada.
         
         Args:
-            root: Elemento raiz do XML
+            root: Elemento raiz do documento
             
         Returns:
-            TaxDetails: Detalhes tributários consolidados
-        """
-        tax_details = TaxDetails()
-        
-        total_elem = root.find('.//nfe:total/nfe:ICMSTot', self.namespaces)
-        if total_elem is None:
-            return tax_details
-        
-        # Extrair totais de tributos
-        v_icms = total_elem.find('nfe:vICMS', self.namespaces)
-        v_pis = total_elem.find('nfe:vPIS', self.namespaces)
-        v_cofins = total_elem.find('nfe:vCOFINS', self.namespaces)
-        v_ipi = total_elem.find('nfe:vIPI', self.namespaces)
-        
-        if v_icms is not None:
-            tax_details.icms_value = Decimal(v_icms.text)
-        if v_pis is not None:
-            tax_details.pis_value = Decimal(v_pis.text)
-        if v_cofins is not None:
-            tax_details.cofins_value = Decimal(v_cofins.text)
-        if v_ipi is not None:
-            tax_details.ipi_value = Decimal(v_ipi.text)
-        
-        # Calcular total de tributos federais
-        tax_details.total_federal_taxes = (
-            tax_details.pis_value + 
-            tax_details.cofins_value + 
-            tax_details.ipi_value +
-            tax_details.ibs_value +  # Será calculado pela API governamental
-            tax_details.cbs_value +  # Será calculado pela API governamental
-            tax_details.selective_tax_value  # Será calculado pela API governamental
-        )
-        
-        return tax_details
-    
-    def _get_required_text(self, parent: _Element, xpath: str, field_name: str) -> str:
+            bool: True se estrutura é válida, False caso contrário
         """
-        Obtém texto de elemento obrigatório.
-        
-        Args:
-            parent: Elemento pai
-            xpath: XPath do elemento
-            field_name: Nome do campo para erro
+        try:
+            # Verificar namespace obrigatório
+            if _NFE_NS not in root.nsmap.values():
+                return False
             
-        Returns:
-            str: Texto do elemento
+            # Verificar elementos obrigatórios conforme layout
+            # (infNFe, ide, emit, dest, ao menos um det e total) em uma
+            # única passagem, encerrada assim que todos forem encontrados
+            inf_nfe = None
+            missing = set(_NFE_REQUIRED_TAGS)
+            for elem in root.iterdescendants(*_NFE_REQUIRED_TAGS):
+                tag = elem.tag
+                if tag in missing:
+                    if tag == _INF_NFE_TAG:
+                        inf_nfe = elem
+                    missing.discard(tag)
+                    if not missing:
+                        break
+            if missing:
+                return False
             
-        Raises:
-            XMLProcessingError: Se elemento não for encontrado
-        """
-        elem = parent.find(xpath, self.namespaces)
-        if elem is None or not elem.text:
-            raise XMLProcessingError(f"{field_name} não encontrado")
-        return elem.text.strip()
+            # Validar versão do layout
+            versao = inf_nfe.get('versao')
+            if versao not in ['4.00']:
+                return False
+            
+            return True
+            
+        except Exception:
+            return False
     
-    def _get_optional_text(self, parent: _Element, xpath: str) -> Optional[str]:
+    @staticmethod
+    def diagnose_nfe_tree(root: _Element) -> List[str]:
         """
-        Obtém texto de elemento opcional.
+        Lista os problemas de estrutura encontrados em uma árvore de NF-e.
+        
+        Verifica o namespace e os elementos obrigatórios em uma única
+        passagem pelos descendentes.
         
         Args:
-            parent: Elemento pai
-            xpath: XPath do elemento
+            root: Elemento raiz do documento
             
         Returns:
-            Optional[str]: Texto do elemento ou None se não encontrado
+            List[str]: Mensagens de erro, na ordem do layout
         """
-        elem = parent.find(xpath, self.namespaces)
-        return elem.text.strip() if elem is not None and elem.text else None
-
-
-class XMLGenerator(LoggerMixin):
-    """
-    Gerador de XML fiscal atualizado com novos valores tributários.
-    
-    Atualiza XMLs existentes preservando estrutura e assinatura digital,
-    modificando apenas os valores tributários calculados.
-    """
-    
-    def __init__(self):
-        self.namespaces = {
-            'nfe': 'http://www.portalfiscal.inf.br/nfe'
-        }
+        errors = []
+        if _NFE_NS not in root.nsmap.values():
+            errors.append("Namespace NF-e não encontrado")
+        
+        pending = set(_REQUIRED_MESSAGES)
+        for elem in root.iterdescendants(*_REQUIRED_MESSAGES):
+            pending.discard(elem.tag)
+            if not pending:
+                break
+        errors.extend(message for tag, message in _REQUIRED_MESSAGES.items() if tag in pending)
+        return errors
     
-    def update_nfe_xml(self, document: NFEDocument) -> str:
+    @staticmethod
+    def validate_nfe_stream(source: BinaryIO) -> bool:
         """
-        Atualiza XML NF-e com novos valores tributários calculados.
+        Valida estrutura básica de NF-e lendo o XML de forma incremental.
+        
+        Aplica as mesmas regras de validate_nfe_structure sem carregar o
+        documento inteiro: elementos já processados são descartados. A
+        leitura segue até o fim do arquivo, de modo que XML truncado ou
+        malformado após os elementos obrigatórios não é aceito.
         
         Args:
-            document: Documento com valores atualizados
+            source: Arquivo binário posicionado no início do XML
             
         Returns:
-            str: XML atualizado
-            
-        Raises:
-            XMLProcessingError: Se atualização falhar
+            bool: True se estrutura é válida, False caso contrário
         """
+        pending = set(_NFE_REQUIRED_TAGS)
+        root_checked = False
+        
         try:
-            # Parse do XML original
-            root = etree.fromstring(document.original_xml.encode('utf-8'))
-            
-            # Atualizar tributos por item
-            self._update_items_taxes(root, document.items)
-            
-            # Atualizar totais do documento
-            self._update_document_totals(root, document)
-            
-            # Gerar XML atualizado com formatação
-            updated_xml = etree.tostring(
-                root,
-                encoding='unicode',
-                pretty_print=True,
-                xml_declaration=True
-            )
-            
-            log_processing_event(
-                "xml_updated_successfully",
-                document.document_key,
-                original_total=float(document.total_document),
-                items_updated=len(document.items)
-            )
-            
-            return updated_xml
-            
-        except Exception as e:
-            self.logger.error(
-                "xml_update_failed",
-                document_key=document.document_key,
-                error=str(e),
-                error_type=type(e).__name__
+            context = etree.iterparse(
+                source,
+                events=('start', 'end'),
+                **XML_PARSER_OPTIONS
             )
-            raise XMLProcessingError(f"Erro ao atualizar XML: {str(e)}")
+            for event, elem in context:
+                if event == 'start':
+                    # Verificar namespace obrigatório no elemento raiz
+                    if not root_checked:
+                        if _NFE_NS not in elem.nsmap.values():
+                            return False
+                        root_checked = True
+                        continue
+                    
+                    if elem.tag in pending:
+                        # Validar versão do layout no primeiro infNFe
+                        if elem.tag == _INF_NFE_TAG and elem.get('versao') not in ['4.00']:
+                            return False
+                        pending.discard(elem.tag)
+                else:
+                    # Liberar memória de elementos já processados
+                    elem.clear()
+                    while elem.getprevious() is not None:
+                        del elem.getparent()[0]
+            
+            return root_checked and not pending
+            
+        except Exception:
+            return False
     
-    def _update_items_taxes(self, root: _Element, items: List[ProductItem]) -> None:
+    @staticmethod
+    def validate_document_key(key: str) -> bool:
         """
-        Atualiza tributos dos itens no XML.
+        Valida chave de acesso do documento fiscal.
         
-        Args:
-            root: Elemento raiz do XML
-            items: Lista de itens com tributos atualizados
-        """
-        det_elements = root.findall('.//nfe:det', self.namespaces)
+        A chave deve ter 44 dígitos numéricos e seguir o padrão:
+        UF + AAMM + CNPJ + MOD + SERIE + NUMERO + CODIGO + DV
         
-        for det in det_elements:
-            item_num = int(det.get('nItem'))
-            
-            # Encontrar item correspondente
-            item = next((i for i in items if i.item_number == item_num), None)
-            if item is None:
-                continue
-            
-            # Atualizar impostos do item
-            imposto = det.find('nfe:imposto', self.namespaces)
-            if imposto is not None:
-                self._update_item_icms(imposto, item.tax_details)
-                self._update_item_pis(imposto, item.tax_details)
-                self._update_item_cofins(imposto, item.tax_details)
-                
-                # TODO: Adicionar novos tributos (IBS, CBS, IS)
-                self._add_new_taxes_to_item(imposto, item.tax_details)
+        Args:
+            key: Chave de acesso a ser validada
             
-            self.logger.debug(
-                "item_taxes_updated",
-                item_number=item_num,
-                product_code=item.product_code,
-                total_taxes=float(item.tax_details.total_federal_taxes)
-            )
-    
-    def _update_item_icms(self, imposto: _Element, tax_details: TaxDetails) -> None:
-        """Atualiza ICMS do item."""
-        icms = imposto.find('nfe:ICMS', self.namespaces)
-        if icms is not None:
-            for icms_child in icms:
-                self._update_element_value(icms_child, 'nfe:vBC', tax_details.icms_base)
-                self._update_element_value(icms_child, 'nfe:pICMS', tax_details.icms_rate)
-                self._update_element_value(icms_child, 'nfe:vICMS', tax_details.icms_value)
-    
-    def _update_item_pis(self, imposto: _Element, tax_details: TaxDetails) -> None:
-        """Atualiza PIS do item."""
-        pis = imposto.find('nfe:PIS', self.namespaces)
-        if pis is not None:
-            for pis_child in pis:
-                self._update_element_value(pis_child, 'nfe:vBC', tax_details.pis_base)
-                self._update_element_value(pis_child, 'nfe:pPIS', tax_details.pis_rate)
-                self._update_element_value(pis_child, 'nfe:vPIS', tax_details.pis_value)
-    
-    def _update_item_cofins(self, imposto: _Element, tax_details: TaxDetails) -> None:
-        """Atualiza COFINS do item."""
-        cofins = imposto.find('nfe:COFINS', self.namespaces)
-        if cofins is not None:
-            for cofins_child in cofins:
-                self._update_element_value(cofins_child, 'nfe:vBC', tax_details.cofins_base)
-                self._update_element_value(cofins_child, 'nfe:pCOFINS', tax_details.cofins_rate)
-                self._update_element_value(cofins_child, 'nfe:vCOFINS', tax_details.cofins_value)
-    
-    def _add_new_taxes_to_item(self, imposto: _Element, tax_details: TaxDetails) -> None:
+        Returns:
+            bool: True se chave é válida, False caso contrário
         """
-        Adiciona novos tributos (IBS, CBS, IS) ao item.
+        if not key or _RE_DOCUMENT_KEY.fullmatch(key) is None:
+            return False
         
-        Args:
-            imposto: Elemento imposto do item
-            tax_details: Detalhes tributários com novos valores
-        """
-        # TODO: Implementar adição de novos tributos conforme layout atualizado
-        # Por enquanto, apenas log dos valores calculados
-        if tax_details.ibs_value > 0:
-            self.logger.debug("ibs_calculated", value=float(tax_details.ibs_value))
-        if tax_details.cbs_value > 0:
-            self.logger.debug("cbs_calculated", value=float(tax_details.cbs_value))
-        if tax_details.selective_tax_value > 0:
-            self.logger.debug("selective_tax_calculated", value=float(tax_details.selective_tax_value))
+        # Validar UF (primeiros 2 dígitos)
+        if int(key[:2]) not in _VALID_UF_CODES:
+            return False
+        
+        # Validar modelo (posições 20-21)
+        modelo = key[20:22]
+        if modelo not in ['55', '65']:  # NF-e ou NFC-e
+            return False
+        
+        # Dígito verificador (módulo 11; restos 0 e 1 resultam em DV 0)
+        d = [b - 48 for b in key.encode('ascii')]
+        remainder = sum(map(operator.mul, d, _DOCUMENT_KEY_WEIGHTS)) % 11
+        digit = 0 if remainder < 2 else 11 - remainder
+        return d[43] == digit
     
-    def _update_document_totals(self, root: _Element, document: NFEDocument) -> None:
+    @staticmethod
+    def validate_cnpj(cnpj: str) -> bool:
         """
-        Atualiza totais do documento no XML.
+        Valida CNPJ usando algoritmo oficial.
         
         Args:
-            root: Elemento raiz do XML
-            document: Documento com totais atualizados
+            cnpj: CNPJ a ser validado (apenas números)
+            
+        Returns:
+            bool: True se CNPJ é válido, False caso contrário
         """
-        total_elem = root.find('.//nfe:total/nfe:ICMSTot', self.namespaces)
-        if total_elem is None:
-            return
+        if not cnpj or _RE_CNPJ.fullmatch(cnpj) is None:
+            return False
         
-        # Atualizar totais de tributos
-        self._update_element_value(total_elem, 'nfe:vICMS', document.tax_details.icms_value)
-        self._update_element_value(total_elem, 'nfe:vPIS', document.tax_details.pis_value)
-        self._update_element_value(total_elem, 'nfe:vCOFINS', document.tax_details.cofins_value)
-        self._update_element_value(total_elem, 'nfe:vIPI', document.tax_details.ipi_value)
+        # Verificar sequências inválidas
+        if cnpj == cnpj[0] * 14:
+            return False
         
-        # TODO: Adicionar novos campos de tributos no total
-        # Aguardando definição do layout atualizado
+        # Dígitos como inteiros (a regex garante apenas ASCII 0-9)
+        d = [b - 48 for b in cnpj.encode('ascii')]
         
-        self.logger.debug(
-            "document_totals_updated",
-            document_key=document.document_key,
-            total_value=float(document.total_document),
-            total_taxes=float(document.tax_details.total_federal_taxes)
+        # Calcular primeiro dígito verificador (pesos 5..2, 9..2)
+        sum1 = (
+            5 * d[0] + 4 * d[1] + 3 * d[2] + 2 * d[3] + 9 * d[4] + 8 * d[5]
+            + 7 * d[6] + 6 * d[7] + 5 * d[8] + 4 * d[9] + 3 * d[10] + 2 * d[11]
         )
-    
-    def _update_element_value(self, parent: _Element, xpath: str, value: Decimal) -> None:
-        """
-        Atualiza valor de um elemento XML.
+        digit1 = 11 - sum1 % 11
+        if digit1 >= 10:
+            digit1 = 0
+        if d[12] != digit1:
+            return False
         
-        Args:
-            parent: Elemento pai
-            xpath: XPath do elemento a atualizar
-            value: Novo valor
-        """
-        if value is None:
-            return
-            
-        elem = parent.find(xpath, self.namespaces)
-        if elem is not None:
-            elem.text = f"{value:.2f}"
+        # Segundo dígito a partir da primeira soma: os pesos 6..3, 2, 9..3
+        # diferem dos anteriores em +1, exceto na posição 4 (9 -> 2), e o
+        # primeiro dígito verificador entra com peso 2
+        sum2 = sum1 + sum(d[:12]) - 8 * d[4] + 2 * digit1
+        digit2 = 11 - sum2 % 11
+        if digit2 >= 10:
+            digit2 = 0
+        
+        return d[13] == digit2
 
 
 class XMLProcessor(LoggerMixin):
@@ -845,74 +545,131 @@ class XMLProcessor(LoggerMixin):
         self.parser = XMLParser()
         self.generator = XMLGenerator()
         self.validator = XMLValidator()
+        
+        # Caches por hash do conteúdo (reenvios do mesmo XML não são reprocessados)
+        cache_size = settings.document_cache_size
+        cache_ttl = settings.cache_ttl_seconds
+        self._document_cache = LRUCache(
+            cache_size, cache_ttl, settings.document_cache_max_bytes
+        )
+        self._validation_cache = LRUCache(cache_size, cache_ttl)
+        self._summary_cache = LRUCache(cache_size, cache_ttl)
     
-    def extract_document_summary(self, xml_content: str) -> Dict:
+    def extract_document_summary(self, xml_content: Union[bytes, str, _Element]) -> Dict:
         """
         Extrai resumo rápido do documento sem processamento completo.
         
         Args:
-            xml_content: Conteúdo XML
+            xml_content: Conteúdo XML ou árvore já parseada
             
         Returns:
             Dict: Resumo com dados básicos do documento
         """
+        # Conteúdo bruto: consultar o cache por hash antes de parsear
+        digest = None
+        if not isinstance(xml_content, _Element):
+            digest = content_digest(xml_content)
+            cached = self._summary_cache.get(digest)
+            if cached is not None:
+                return dict(cached)
+        
         try:
-            root = etree.fromstring(xml_content.encode('utf-8'))
-            namespaces = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
+            # Árvore já disponível: reaproveitá-la; conteúdo bruto: streaming
+            if digest is None:
+                return self._tree_summary(xml_content)
             
-            # Extrair dados básicos
-            inf_nfe = root.find('.//nfe:infNFe', namespaces)
-            document_key = inf_nfe.get('Id', '').replace('NFe', '') if inf_nfe is not None else ''
-            
-            ide = root.find('.//nfe:ide', namespaces)
-            serie = ide.find('nfe:serie', namespaces).text if ide is not None and ide.find('nfe:serie', namespaces) is not None else ''
-            numero = ide.find('nfe:nNF', namespaces).text if ide is not None and ide.find('nfe:nNF', namespaces) is not None else ''
-            
-            emit = root.find('.//nfe:emit', namespaces)
-            emitente = emit.find('nfe:xNome', namespaces).text if emit is not None and emit.find('nfe:xNome', namespaces) is not None else ''
-            
-            total = root.find('.//nfe:total/nfe:ICMSTot/nfe:vNF', namespaces)
-            valor_total = total.text if total is not None else '0.00'
-            
-            return {
-                'document_key': document_key,
-                'series': serie,
-                'number': numero,
-                'emitter_name': emitente,
-                'total_value': valor_total,
-                'valid_structure': self.validate_xml_structure(xml_content, DocumentType.NFE)
-            }
+            summary = self._stream_summary(xml_content)
+            self._summary_cache.set(digest, dict(summary))
+            return summary
             
         except Exception as e:
             self.logger.error("summary_extraction_failed", error=str(e))
-            return {
-                'document_key': '',
-                'series': '',
-                'number': '',
-                'emitter_name': '',
-                'total_value': '0.00',
-                'valid_structure': False,
-                'error': str(e)
-            }
+            return {**_empty_summary(), 'valid_structure': False, 'error': str(e)}
     
-    def validate_xml_structure(self, xml_content: str, document_type: DocumentType) -> bool:
+    def _tree_summary(self, root: _Element) -> Dict:
+        """Extrai o resumo a partir de uma árvore já parseada."""
+        summary = _empty_summary()
+        extracted = set()
+        items_count = 0
+        
+        for elem in root.iterdescendants(*_NFE_REQUIRED_TAGS):
+            tag = elem.tag
+            if tag == _DET_TAG:
+                items_count += 1
+            elif tag not in extracted:
+                # Vale a primeira ocorrência de cada bloco
+                extracted.add(tag)
+                if tag == _INF_NFE_TAG:
+                    summary['document_key'] = elem.get('Id', '').replace('NFe', '')
+                else:
+                    _summary_block(summary, tag, elem)
+        
+        summary['items_count'] = items_count
+        summary['valid_structure'] = self.validate_xml_structure(root, DocumentType.NFE)
+        return summary
+    
+    def _stream_summary(self, xml_content: Union[bytes, str]) -> Dict:
         """
-        Valida estrutura de XML fiscal.
+        Extrai o resumo em streaming (iterparse), sem montar a árvore completa.
+        
+        Cada bloco é lido ao ser fechado e descartado em seguida; itens (det)
+        são apenas contados. A leitura segue até o fim do documento, de modo
+        que XML truncado ou malformado em qualquer ponto é rejeitado, e a
+        validação de estrutura segue validate_nfe_tree.
         
         Args:
-            xml_content: Conteúdo XML a ser validado
-            document_type: Tipo de documento esperado
+            xml_content: Conteúdo XML do documento
             
         Returns:
-            bool: True se estrutura é válida, False caso contrário
+            Dict: Resumo com dados básicos do documento
+            
+        Raises:
+            etree.XMLSyntaxError: Se o XML for malformado
         """
-        if document_type == DocumentType.NFE:
-            return self.validator.validate_nfe_structure(xml_content)
+        if isinstance(xml_content, str):
+            xml_content = xml_content.encode('utf-8')
+        
+        summary = _empty_summary()
+        pending = set(_NFE_REQUIRED_TAGS)
+        extracted = set()
+        namespace_ok = None
+        version_ok = False
+        
+        context = etree.iterparse(
+            BytesIO(xml_content),
+            events=('start', 'end'),
+            tag=tuple(_NFE_REQUIRED_TAGS),
+            **XML_PARSER_OPTIONS
+        )
+        for event, elem in context:
+            if namespace_ok is None:
+                # Namespace obrigatório verificado no elemento raiz
+                namespace_ok = _NFE_NS in elem.getroottree().getroot().nsmap.values()
+            
+            tag = elem.tag
+            if event == 'start':
+                if tag == _INF_NFE_TAG and tag in pending:
+                    version_ok = elem.get('versao') in ['4.00']
+                    summary['document_key'] = elem.get('Id', '').replace('NFe', '')
+                pending.discard(tag)
+                continue
+            
+            if tag == _DET_TAG:
+                summary['items_count'] += 1
+            elif tag != _INF_NFE_TAG and tag not in extracted:
+                # Vale a primeira ocorrência de cada bloco
+                extracted.add(tag)
+                _summary_block(summary, tag, elem)
+            
+            # Liberar memória do bloco já lido
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
         
-        # TODO: Implementar validação para outros tipos (NFC-e, CT-e, etc.)
-        return False
+        summary['valid_structure'] = bool(namespace_ok) and not pending and version_ok
+        return summary
     
-    def process_nfe_document(self, xml_content: str) -> NFEDocument:
+    def process_nfe_document(self, xml_content: Union[bytes, str]) -> NFEDocument:
         """
         Processa documento NF-e completo com atualização tributária.
         
@@ -925,21 +682,39 @@ class XMLProcessor(LoggerMixin):
         Raises:
             XMLProcessingError: Se processamento falhar
         """
-        start_time = datetime.utcnow()
+        digest = content_digest(xml_content)
+        cached = self._document_cache.get(digest)
+        if cached is not None:
+            self.logger.debug("document_cache_hit", document_key=cached.document_key)
+            # Reenvio é um novo processamento: id e datas próprios
+            now = datetime.utcnow()
+            return cached.model_copy(
+                update={'id': uuid4(), 'created_at': now, 'updated_at': now},
+                deep=True
+            )
+        
+        start_time = time.perf_counter_ns()
         
         try:
+            # Parse único: a mesma árvore serve à extração e à geração do XML
+            try:
+                root = parse_xml(xml_content)
+            except etree.XMLSyntaxError:
+                # O parser reporta o erro de estrutura no formato usual
+                root = None
+            
             # Parse do documento
-            document = self.parser.parse_nfe_document(xml_content)
+            document = self.parser.parse_nfe_document(xml_content, root)
             
             # TODO: Integrar com TaxCalculatorService para atualizar tributos
             # Por enquanto, manter valores originais
             
             # Gerar XML atualizado
-            updated_xml = self.generator.update_nfe_xml(document)
+            updated_xml = self.generator.update_nfe_xml(document, root)
             document.updated_xml = updated_xml
             document.updated_at = datetime.utcnow()
             
-            processing_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+            processing_time = (time.perf_counter_ns() - start_time) / 1_000_000
             
             log_processing_event(
                 "document_processed_successfully",
@@ -950,10 +725,15 @@ class XMLProcessor(LoggerMixin):
                 total_value=float(document.total_document)
             )
             
+            self._document_cache.set(
+                digest,
+                document.model_copy(deep=True),
+                size=len(document.original_xml) + len(document.updated_xml or b'')
+            )
             return document
             
         except Exception as e:
-            processing_time = (datetime.utcnow() - start_time).total_seconds() * 1000
+            processing_time = (time.perf_counter_ns() - start_time) / 1_000_000
             
             self.logger.error(
                 "document_processing_failed",
@@ -964,19 +744,49 @@ class XMLProcessor(LoggerMixin):
             )
             raise
     
-    def validate_xml_structure(self, xml_content: str, document_type: DocumentType) -> bool:
+    def validate_xml_structure(
+        self,
+        xml_content: Union[bytes, str, _Element],
+        document_type: DocumentType
+    ) -> bool:
         """
         Valida estrutura de XML fiscal.
         
         Args:
-            xml_content: Conteúdo XML a validar
+            xml_content: Conteúdo XML a validar ou árvore já parseada
+            document_type: Tipo de documento fiscal
+            
+        Returns:
+            bool: True se estrutura é válida
+        """
+        if document_type == DocumentType.NFE:
+            # Árvore já parseada: validar diretamente, sem novo parse
+            if isinstance(xml_content, _Element):
+                return self.validator.validate_nfe_tree(xml_content)
+            
+            key = (content_digest(xml_content), document_type)
+            is_valid = self._validation_cache.get(key)
+            if is_valid is None:
+                is_valid = self.validator.validate_nfe_structure(xml_content)
+                self._validation_cache.set(key, is_valid)
+            return is_valid
+        
+        # TODO: Implementar validação para outros tipos (NFC-e, CT-e, etc.)
+        return False
+    
+    def validate_xml_stream(self, source: BinaryIO, document_type: DocumentType) -> bool:
+        """
+        Valida estrutura de XML fiscal lido em streaming de um arquivo.
+        
+        Args:
+            source: Arquivo binário com o conteúdo XML
             document_type: Tipo de documento fiscal
             
         Returns:
             bool: True se estrutura é válida
         """
         if document_type == DocumentType.NFE:
-            return self.validator.validate_nfe_structure(xml_content)
+            return self.validator.validate_nfe_stream(source)
         
         # TODO: Implementar validação para outros tipos (NFC-e, CT-e, etc.)
         return False
@@ -985,60 +795,48 @@ class XMLProcessor(LoggerMixin):
 class XMLParser(LoggerMixin):
     """Parser de XML fiscal."""
     
-    def __init__(self):
-        self.namespaces = {
-            'nfe': 'http://www.portalfiscal.inf.br/nfe'
-        }
-    
-    def parse_nfe_document(self, xml_content: str) -> NFEDocument:
-        """Converte XML NF-e em modelo de dados."""
-        try:
-            # Validar estrutura
-            if not XMLValidator.validate_nfe_structure(xml_content):
-                raise XMLProcessingError("Estrutura XML inválida para NF-e")
-            
-            root = etree.fromstring(xml_content.encode('utf-8'))
-            
-            # Extrair dados principais
-            inf_nfe = root.find('.//nfe:infNFe', self.namespaces)
-            if inf_nfe is None:
-                raise XMLProcessingError("Elemento infNFe não encontrado")
-            
-            document_key = inf_nfe.get('Id', '').replace('NFe', '')
-            
-            if not XMLValidator.validate_document_key(document_key):
-                raise XMLProcessingError(f"Chave de documento inválida: {document_key}")
-            
-            # Extrair identificação
-            ide_data = self._extract_identification(root)
-            
-            # Extrair emitente e destinatário
-            emitter = self._extract_company_info(root, './/nfe:emit')
-            recipient = self._extract_company_info(root, './/nfe:dest')
-            
-            # Extrair itens
-            items = self._extract_items(root)
+    def parse_nfe_document(
+        self,
+        xml_content: Union[bytes, str],
+        root: Optional[_Element] = None
+    ) -> NFEDocument:
+        """
+        Converte XML NF-e em modelo de dados.
+        
+        Args:
+            xml_content: Conteúdo XML da NF-e
+            root: Árvore já parseada do mesmo conteúdo, quando o chamador
+                também precisa dela (é percorrida sem ser alterada)
             
-            # Extrair totais
-            totals = self._extract_totals(root)
+        Returns:
+            NFEDocument: Documento extraído
             
-            # Extrair tributação
-            tax_details = self._extract_tax_details(root)
+        Raises:
+            XMLProcessingError: Se o XML for inválido
+        """
+        try:
+            # Leitura única: cada bloco é extraído assim que é fechado
+            data = self._stream_nfe(xml_content, root)
+            document_key = data['document_key']
+            ide_data = data['ide']
+            totals = data['totals']
+            items = data['items']
             
             # Criar documento
             document = NFEDocument(
                 document_key=document_key,
                 document_type=DocumentType.NFE,
-                series=ide_data['series'],
-                number=ide_data['number'],
-                issue_date=ide_data['issue_date'],
-                emitter=emitter,
-                recipient=recipient,
+                series=ide_data.series,
+                number=ide_data.number,
+                issue_date=ide_data.issue_date,
+                emitter=data['emit'],
+                recipient=data['dest'],
                 items=items,
-                total_products=totals['products'],
-                total_services=totals['services'],
-                total_document=totals['total'],
-                tax_details=tax_details,
+                total_products=totals.products,
+                total_services=totals.services,
+                total_document=totals.total,
+                tax_details=data['tax_details'],
+                # Bytes recebidos são guardados sem decodificar (str é codificado pelo modelo)
                 original_xml=xml_content
             )
             
@@ -1047,7 +845,7 @@ class XMLParser(LoggerMixin):
                 document_key,
                 document_type="nfe",
                 items_count=len(items),
-                total_value=float(totals['total'])
+                total_value=float(totals.total)
             )
             
             return document
@@ -1060,150 +858,262 @@ class XMLParser(LoggerMixin):
             )
             raise XMLProcessingError(f"Erro ao processar XML: {str(e)}")
     
-    def _extract_identification(self, root: _Element) -> Dict:
+    def _stream_nfe(
+        self,
+        xml_content: Union[bytes, str],
+        root: Optional[_Element] = None
+    ) -> Dict:
+        """
+        Extrai os dados da NF-e em uma única leitura incremental (iterparse).
+        
+        Cada bloco (ide, emit, dest, det, total) é convertido assim que o
+        elemento é fechado e em seguida descartado, de modo que a memória de
+        pico corresponde a um item por vez, e não à árvore inteira. As regras
+        de estrutura são as mesmas de XMLValidator.validate_nfe_tree.
+        
+        Com `root`, a árvore existente é percorrida com iterwalk (mesmos
+        eventos) e mantida intacta para o chamador.
+        
+        Args:
+            xml_content: Conteúdo XML da NF-e
+            root: Árvore já parseada do mesmo conteúdo (opcional)
+            
+        Returns:
+            Dict: Chave, identificação, emitente, destinatário, itens e totais
+            
+        Raises:
+            XMLProcessingError: Se a estrutura ou a chave forem inválidas
+        """
+        data = {'items': []}
+        pending = set(_NFE_REQUIRED_TAGS)
+        document_key = None
+        # Erros de extração só são propagados depois das verificações de
+        # estrutura e da chave, na mesma precedência da validação em árvore
+        extraction_error = None
+        if root is not None:
+            context = etree.iterwalk(
+                root,
+                events=('start', 'end'),
+                tag=tuple(_NFE_REQUIRED_TAGS)
+            )
+        else:
+            if isinstance(xml_content, str):
+                xml_content = xml_content.encode('utf-8')
+            context = etree.iterparse(
+                BytesIO(xml_content),
+                events=('start', 'end'),
+                tag=tuple(_NFE_REQUIRED_TAGS),
+                **XML_PARSER_OPTIONS
+            )
+        
+        try:
+            for event, elem in context:
+                tag = elem.tag
+                if event == 'start':
+                    # Validar versão do layout no primeiro infNFe
+                    if tag == _INF_NFE_TAG and tag in pending:
+                        if elem.get('versao') not in ['4.00']:
+                            raise XMLProcessingError("Estrutura XML inválida para NF-e")
+                        document_key = elem.get('Id', '').replace('NFe', '')
+                    pending.discard(tag)
+                    continue
+                
+                if tag == _INF_NFE_TAG:
+                    continue
+                
+                if extraction_error is None:
+                    try:
+                        self._extract_block(tag, elem, data)
+                    except Exception as e:
+                        extraction_error = e
+                
+                # Liberar memória do bloco já convertido (apenas no streaming)
+                if root is None:
+                    elem.clear()
+                    while elem.getprevious() is not None:
+                        del elem.getparent()[0]
+        except etree.XMLSyntaxError:
+            raise XMLProcessingError("Estrutura XML inválida para NF-e")
+        
+        if root is None:
+            root = context.root
+        
+        encoding = root.getroottree().docinfo.encoding
+        if encoding and encoding.upper() not in _UTF8_ENCODINGS:
+            raise XMLProcessingError(
+                f"Codificação XML não suportada: {encoding} (use UTF-8)"
+            )
+        
+        # Namespace obrigatório no elemento raiz e todos os elementos do layout
+        if pending or _NFE_NS not in root.nsmap.values():
+            raise XMLProcessingError("Estrutura XML inválida para NF-e")
+        
+        if not XMLValidator.validate_document_key(document_key):
+            raise XMLProcessingError(f"Chave de documento inválida: {document_key}")
+        
+        if extraction_error is not None:
+            raise extraction_error
+        
+        data['document_key'] = document_key
+        return data
+    
+    def _extract_block(self, tag: str, elem: _Element, data: Dict) -> None:
+        """Converte um bloco já fechado (ide, emit, dest, det, total) em data."""
+        if tag == _DET_TAG:
+            item = self._extract_item(elem)
+            if item is not None:
+                data['items'].append(item)
+        # Vale a primeira ocorrência de cada bloco do cabeçalho
+        elif tag == _IDE_TAG:
+            if 'ide' not in data:
+                data['ide'] = self._extract_identification(elem)
+        elif tag == _EMIT_TAG:
+            if 'emit' not in data:
+                data['emit'] = self._extract_company_info(elem, _ENDER_EMIT_TAG)
+        elif tag == _DEST_TAG:
+            if 'dest' not in data:
+                data['dest'] = self._extract_company_info(elem, _ENDER_DEST_TAG)
+        elif tag == _TOTAL_TAG:
+            if 'totals' not in data:
+                # ICMSTot localizado uma única vez para totais e tributação
+                icms_tot = elem.find(_ICMSTOT_TAG)
+                if icms_tot is None:
+                    raise XMLProcessingError("Totais não encontrados")
+                data['totals'] = self._extract_totals(icms_tot)
+                data['tax_details'] = self._extract_tax_details(icms_tot)
+    
+    def _extract_identification(self, ide: _Element) -> _Identification:
         """Extrai dados de identificação do documento."""
-        ide = root.find('.//nfe:ide', self.namespaces)
-        if ide is None:
-            raise XMLProcessingError("Elemento ide não encontrado")
+        ide_data = _child_texts(ide, _IDE_FIELDS)
         
         # Data de emissão
-        dh_emi = ide.find('nfe:dhEmi', self.namespaces)
-        if dh_emi is not None:
-            issue_date = datetime.fromisoformat(dh_emi.text.replace('Z', '+00:00'))
-        else:
+        if 'issue_datetime' in ide_data:
+            # Python 3.11+ aceita o sufixo 'Z' diretamente
+            issue_date = datetime.fromisoformat(ide_data['issue_datetime'])
+        elif 'issue_date' in ide_data:
             # Fallback para dEmi (formato antigo)
-            d_emi = ide.find('nfe:dEmi', self.namespaces)
-            if d_emi is not None:
-                issue_date = datetime.strptime(d_emi.text, '%Y-%m-%d')
-            else:
-                raise XMLProcessingError("Data de emissão não encontrada")
-        
-        return {
-            'series': int(ide.find('nfe:serie', self.namespaces).text),
-            'number': int(ide.find('nfe:nNF', self.namespaces).text),
-            'issue_date': issue_date
-        }
+            issue_date = datetime.strptime(ide_data['issue_date'], '%Y-%m-%d')
+        else:
+            raise XMLProcessingError("Data de emissão não encontrada")
+        
+        return _Identification(
+            series=int(ide_data['series']),
+            number=int(ide_data['number']),
+            issue_date=issue_date
+        )
     
-    def _extract_company_info(self, root: _Element, xpath: str) -> CompanyInfo:
+    def _extract_company_info(
+        self,
+        company_elem: _Element,
+        address_tag: str
+    ) -> CompanyInfo:
         """Extrai informações de empresa (emitente/destinatário)."""
-        company_elem = root.find(xpath, self.namespaces)
-        if company_elem is None:
-            raise XMLProcessingError(f"Elemento não encontrado: {xpath}")
+        company = _child_texts(company_elem, _COMPANY_FIELDS)
         
         # CNPJ
-        cnpj_elem = company_elem.find('nfe:CNPJ', self.namespaces)
-        if cnpj_elem is None:
+        if 'cnpj' not in company:
             raise XMLProcessingError("CNPJ não encontrado")
         
         # Endereço
-        ender_elem = company_elem.find('nfe:enderEmit' if 'emit' in xpath else 'nfe:enderDest', self.namespaces)
-        if ender_elem is None:
-            ender_elem = company_elem.find('nfe:endereco', self.namespaces)
-        
+        ender_elem = company_elem.find(address_tag)
         if ender_elem is None:
             raise XMLProcessingError("Endereço não encontrado")
         
+        address = _child_texts(ender_elem, _ADDRESS_FIELDS)
+        
         return CompanyInfo(
-            cnpj=cnpj_elem.text,
-            company_name=company_elem.find('nfe:xNome', self.namespaces).text,
-            trade_name=self._get_optional_text(company_elem, 'nfe:xFant'),
-            address=f"{ender_elem.find('nfe:xLgr', self.namespaces).text}, {ender_elem.find('nfe:nro', self.namespaces).text}",
-            city=ender_elem.find('nfe:xMun', self.namespaces).text,
-            state=ender_elem.find('nfe:UF', self.namespaces).text,
-            zip_code=ender_elem.find('nfe:CEP', self.namespaces).text,
-            phone=self._get_optional_text(ender_elem, 'nfe:fone'),
-            email=self._get_optional_text(company_elem, 'nfe:email')
+            cnpj=company['cnpj'],
+            company_name=company['company_name'],
+            trade_name=company.get('trade_name'),
+            address=f"{address['street']}, {address['number']}",
+            city=address['city'],
+            state=address['state'],
+            zip_code=address['zip_code'],
+            phone=address.get('phone'),
+            email=company.get('email')
         )
     
-    def _extract_items(self, root: _Element) -> List[ProductItem]:
-        """Extrai itens do documento."""
-        items = []
-        det_elements = root.findall('.//nfe:det', self.namespaces)
-        
-        for det in det_elements:
-            item_num = int(det.get('nItem'))
-            
-            prod = det.find('nfe:prod', self.namespaces)
-            if prod is None:
-                continue
-            
-            # Dados do produto
-            product_code = prod.find('nfe:cProd', self.namespaces).text
-            product_name = prod.find('nfe:xProd', self.namespaces).text
-            ncm = prod.find('nfe:NCM', self.namespaces).text
-            cfop = prod.find('nfe:CFOP', self.namespaces).text
-            unit = prod.find('nfe:uCom', self.namespaces).text
-            quantity = Decimal(prod.find('nfe:qCom', self.namespaces).text)
-            unit_value = Decimal(prod.find('nfe:vUnCom', self.namespaces).text)
-            total_value = Decimal(prod.find('nfe:vProd', self.namespaces).text)
-            
-            # Tributação do item
-            tax_details = self._extract_item_tax_details(det)
-            
-            item = ProductItem(
-                item_number=item_num,
-                product_code=product_code,
-                product_name=product_name,
-                ncm=ncm,
-                cfop=cfop,
-                unit=unit,
-                quantity=quantity,
-                unit_value=unit_value,
-                total_value=total_value,
-                tax_details=tax_details
-            )
-            
-            items.append(item)
-        
-        return items
+    def _extract_item(self, det: _Element) -> Optional[ProductItem]:
+        """Extrai um item (det) do documento, ou None se não houver prod."""
+        # prod e imposto localizados na mesma passagem pelos filhos de det
+        prod = imposto = None
+        for child in det:
+            tag = child.tag
+            if tag == _PROD_TAG:
+                if prod is None:
+                    prod = child
+            elif tag == _IMPOSTO_TAG:
+                if imposto is None:
+                    imposto = child
+        if prod is None:
+            return None
+        
+        # Número do item convertido apenas para itens efetivamente extraídos
+        item_num = int(det.get('nItem'))
+        
+        # Dados do produto (uma passagem pelos filhos de prod)
+        prod_data = _child_texts(prod, _PROD_FIELDS)
+        
+        # Tributação do item
+        tax_details = self._extract_item_tax_details(imposto)
+        
+        return ProductItem(
+            item_number=item_num,
+            product_code=prod_data['product_code'],
+            product_name=prod_data['product_name'],
+            ncm=prod_data['ncm'],
+            cfop=prod_data['cfop'],
+            unit=prod_data['unit'],
+            quantity=_parse_decimal(prod_data['quantity']),
+            unit_value=_parse_decimal(prod_data['unit_value']),
+            total_value=_parse_decimal(prod_data['total_value']),
+            tax_details=tax_details
+        )
     
-    def _extract_item_tax_details(self, det_element: _Element) -> TaxDetails:
-        """Extrai detalhes tributários de um item."""
+    def _extract_item_tax_details(self, imposto: Optional[_Element]) -> TaxDetails:
+        """Extrai detalhes tributários de um item a partir do grupo imposto."""
         # Por enquanto, retorna valores zerados
         # TODO: Implementar extração real de tributos por item
         return TaxDetails()
     
-    def _extract_totals(self, root: _Element) -> Dict[str, Decimal]:
-        """Extrai totais do documento."""
-        total_elem = root.find('.//nfe:total/nfe:ICMSTot', self.namespaces)
-        if total_elem is None:
-            raise XMLProcessingError("Totais não encontrados")
+    def _extract_totals(self, icms_tot: _Element) -> _Totals:
+        """Extrai totais do documento a partir do grupo ICMSTot."""
+        values = _child_texts(icms_tot, _TOTALS_FIELDS)
         
-        v_prod = total_elem.find('nfe:vProd', self.namespaces)
-        v_serv = total_elem.find('nfe:vServ', self.namespaces)
-        v_nf = total_elem.find('nfe:vNF', self.namespaces)
-        
-        return {
-            'products': Decimal(v_prod.text) if v_prod is not None else Decimal('0'),
-            'services': Decimal(v_serv.text) if v_serv is not None else Decimal('0'),
-            'total': Decimal(v_nf.text) if v_nf is not None else Decimal('0')
-        }
+        return _Totals._make(
+            _parse_decimal(values[field]) if field in values else _ZERO
+            for field in _Totals._fields
+        )
     
-    def _extract_tax_details(self, root: _Element) -> TaxDetails:
-        """Extrai detalhes tributários do documento."""
+    def _extract_tax_details(self, icms_tot: _Element) -> TaxDetails:
+        """Extrai detalhes tributários do documento a partir do grupo ICMSTot."""
         # Por enquanto, retorna valores zerados
         # TODO: Implementar extração real de tributos do documento
         return TaxDetails()
-    
-    def _get_optional_text(self, parent: _Element, xpath: str) -> Optional[str]:
-        """Obtém texto de elemento opcional."""
-        elem = parent.find(xpath, self.namespaces)
-        return elem.text if elem is not None else None
 
 
 class XMLGenerator(LoggerMixin):
     """Gerador de XML fiscal atualizado."""
     
-    def __init__(self):
-        self.namespaces = {
-            'nfe': 'http://www.portalfiscal.inf.br/nfe'
-        }
-    
-    def update_nfe_xml(self, document: NFEDocument) -> str:
-        """Atualiza XML NF-e com novos valores tributários."""
+    def update_nfe_xml(self, document: NFEDocument, root: Optional[_Element] = None) -> bytes:
+        """
+        Atualiza XML NF-e com novos valores tributários (UTF-8, com declaração).
+        
+        Args:
+            document: Documento com os valores atualizados
+            root: Árvore do XML original já parseada; sem ela, o XML
+                original do documento é parseado novamente
+            
+        Returns:
+            bytes: XML atualizado
+            
+        Raises:
+            XMLProcessingError: Se a atualização falhar
+        """
         try:
-            # Parse do XML original
-            root = etree.fromstring(document.original_xml.encode('utf-8'))
+            # Parse do XML original, apenas se a árvore não foi fornecida
+            if root is None:
+                root = parse_xml(document.original_xml)
             
             # Atualizar tributos por item
             self._update_items_taxes(root, document.items)
@@ -1211,11 +1121,12 @@ class XMLGenerator(LoggerMixin):
             # Atualizar totais do documento
             self._update_document_totals(root, document)
             
-            # Gerar XML atualizado
+            # Gerar XML atualizado direto em bytes UTF-8, sem indentação
+            # (pretty_print altera o conteúdo assinado e aumenta o tamanho)
             updated_xml = etree.tostring(
                 root,
-                encoding='unicode',
-                pretty_print=True
+                encoding='utf-8',
+                xml_declaration=True
             )
             
             log_processing_event(
@@ -1237,19 +1148,26 @@ class XMLGenerator(LoggerMixin):
     
     def _update_items_taxes(self, root: _Element, items: List[ProductItem]) -> None:
         """Atualiza tributos dos itens no XML."""
-        det_elements = root.findall('.//nfe:det', self.namespaces)
+        # Nível verificado uma vez (logger stdlib de mesmo nome, como no
+        # filter_by_level). Enquanto a atualização por item for apenas log,
+        # não há o que fazer sem DEBUG: nem percorrer os det nem indexar itens
+        if not logging.getLogger(self.__class__.__name__).isEnabledFor(logging.DEBUG):
+            return
         
-        for det in det_elements:
+        logger = self.logger
+        items_by_number = {item.item_number: item for item in items}
+        
+        for det in root.iterdescendants(_DET_TAG):
             item_num = int(det.get('nItem'))
             
             # Encontrar item correspondente
-            item = next((i for i in items if i.item_number == item_num), None)
+            item = items_by_number.get(item_num)
             if item is None:
                 continue
             
             # TODO: Implementar atualização real de tributos por item
-            # Por enquanto, apenas log
-            self.logger.debug(
+            # (remover o retorno antecipado acima). Por enquanto, apenas log
+            logger.debug(
                 "updating_item_taxes",
                 item_number=item_num,
                 product_code=item.product_code
@@ -1257,7 +1175,7 @@ class XMLGenerator(LoggerMixin):
     
     def _update_document_totals(self, root: _Element, document: NFEDocument) -> None:
         """Atualiza totais do documento no XML."""
-        total_elem = root.find('.//nfe:total/nfe:ICMSTot', self.namespaces)
+        total_elem = _first(_XP_ICMSTOT, root)
         if total_elem is None:
             return
         
@@ -1270,13 +1188,70 @@ class XMLGenerator(LoggerMixin):
         )
 
 
+@lru_cache(maxsize=1)
+def get_processor() -> XMLProcessor:
+    """
+    Retorna a instância compartilhada de XMLProcessor do processo atual.
+    
+    O processador não guarda estado por requisição, portanto uma única
+    instância é reutilizada por todos os handlers e threads.
+    
+    Returns:
+        XMLProcessor: Processador compartilhado
+    """
+    return XMLProcessor()
+
 
+def process_nfe_documents_worker(xml_contents: List[Union[bytes, str]]) -> List[bool]:
+    """
+    Processa um bloco de NF-e dentro de um processo worker.
     
-    def validate_xml_structure(self, xml_content: str, document_type: DocumentType) -> bool:
-        """Valida estrutura de XML fiscal."""
-        if document_type == DocumentType.NFE:
-            return self.validator.validate_nfe_structure(xml_content)
+    Função de módulo (serializável via pickle) para uso com
+    ProcessPoolExecutor; cada processo usa seu próprio get_processor().
+    Uma única chamada ao pool atende vários documentos e apenas o
+    status de cada um volta ao processo principal, sem serializar os
+    documentos (e seus XMLs). Falhas não interrompem o bloco.
+    
+    Args:
+        xml_contents: Conteúdos XML das NF-e
         
-        # TODO: Implementar validação para outros tipos
-        return False
+    Returns:
+        List[bool]: Se cada documento foi processado com sucesso, na
+        mesma ordem da entrada
+    """
+    processor = get_processor()
+    results: List[bool] = []
+    for xml_content in xml_contents:
+        try:
+            processor.process_nfe_document(xml_content)
+            results.append(True)
+        except Exception:
+            # process_nfe_document já registrou document_processing_failed;
+            # o processo principal contabiliza a falha no job
+            results.append(False)
+    return results
+
+
+def init_pool_worker() -> None:
+    """
+    Inicializa um processo do pool de XML.
+    
+    Configura o logging do processo e desativa o cache de documentos: o
+    worker devolve apenas o status ao processo principal, então manter
+    NFEDocument em cache só consumiria memória em cada worker.
+    """
+    configure_logging()
+    get_processor()._document_cache = LRUCache(0)
+
 
+def extract_document_summary_worker(xml_content: Union[bytes, str]) -> Dict:
+    """
+    Extrai o resumo de um documento dentro de um processo worker.
+    
+    Args:
+        xml_content: Conteúdo XML do documento
+        
+    Returns:
+        Dict: Resumo com dados básicos do documento
+    """
+    return get_processor().extract_document_summary(xml_content)
@@ -5,13 +5,19 @@ Este módulo configura e inicializa a aplicação FastAPI com todas as suas
 dependências, middlewares, rotas e configurações de ciclo de vida.
 """
 
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import asynccontextmanager
+from datetime import datetime
 from typing import AsyncGenerator
 
+from anyio import to_thread
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from app.core import configure_logging, settings
+from app.services.government_api import GovernmentAPIClient
+from app.services.xml_processor import init_pool_worker
 
 
 @asynccontextmanager
@@ -31,11 +37,21 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     # === STARTUP ===
     configure_logging()
     
+    # Dimensionar o pool de threads usado para o parsing de XML (CPU-bound)
+    to_thread.current_default_thread_limiter().total_tokens = settings.thread_pool_size
+    
+    # Pool de processos para processamento de lotes de XML em paralelo
+    app.state.xml_pool = ProcessPoolExecutor(
+        max_workers=settings.xml_process_workers,
+        initializer=init_pool_worker
+    )
+    
     yield
     
     # === SHUTDOWN ===
+    app.state.xml_pool.shutdown(wait=True, cancel_futures=True)
+    await GovernmentAPIClient.aclose_shared()
     # TODO: Implementar limpeza de recursos (conexões DB, cache, etc.)
-    pass
 
 
 def create_app() -> FastAPI:
@@ -56,6 +72,7 @@ def create_app() -> FastAPI:
         description="API para processamento automatizado de documentos fiscais eletrônicos",
         docs_url="/docs" if settings.debug else None,
         redoc_url="/redoc" if settings.debug else None,
+        default_response_class=ORJSONResponse,
         lifespan=lifespan
     )
     
@@ -79,7 +96,6 @@ def create_app() -> FastAPI:
     @app.get("/")
     async def root():
         """Endpoint raiz da API com informações básicas."""
-        from datetime import datetime
         return {
             "message": "API Fiscal XML - Processamento de Documentos Fiscais",
             "version": settings.app_version,
@@ -106,6 +122,9 @@ if __name__ == "__main__":
         host=settings.host,
         port=settings.port,
         reload=settings.debug,
-        log_level=settings.log_level.lower()
+        log_level=settings.log_level.lower(),
+        loop="uvloop",
+        http="httptools",
+        access_log=settings.access_log
     )
 